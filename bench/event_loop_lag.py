@@ -0,0 +1,124 @@
+"""画布导出/保存路由对事件循环的阻塞测量。
+
+在事件循环中运行一个固定间隔的心跳任务，同时并发调用 /funcode/canvas_export
+与 /funcode/canvas_save 的处理函数，统计心跳的延迟（即事件循环被阻塞的时长）。
+
+    python bench/event_loop_lag.py --size 4k --requests 4
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run_benchmarks as rb  # noqa: E402
+
+
+class _FakeRequest:
+    def __init__(self, data):
+        self._data = data
+        self.query = {}
+
+    async def json(self):
+        return self._data
+
+
+def make_data_url(width, height):
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    # 低分辨率噪声放大，压缩率接近真实画布
+    small = rng.integers(0, 256, size=(max(height // 16, 1), max(width // 16, 1), 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+async def heartbeat(samples, stop, interval):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, (loop.time() - start - interval) * 1000.0))
+
+
+async def run(canvas, server, data_url, requests, interval):
+    storage = server.PromptServer.instance._funcode_canvas_storage
+    samples = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(samples, stop, interval))
+    await asyncio.sleep(interval * 4)
+
+    calls = []
+    for i in range(requests):
+        if i % 2 == 0:
+            node_id = "bench{}".format(i)
+            storage[node_id] = {"event": threading.Event(), "image": None, "payload": None}
+            calls.append(canvas.funcode_canvas_export(_FakeRequest({"node_id": node_id, "image_b64": data_url})))
+        else:
+            calls.append(canvas.funcode_canvas_save(_FakeRequest({"image_b64": data_url, "filename": "bench{}.png".format(i)})))
+    start = time.perf_counter()
+    responses = await asyncio.gather(*calls)
+    elapsed = (time.perf_counter() - start) * 1000.0
+    await asyncio.sleep(interval * 4)
+    stop.set()
+    await beat
+    return {
+        "requests": requests,
+        "wall_ms": elapsed,
+        "statuses": [r.status for r in responses],
+        "lag_ms": {
+            "max": max(samples),
+            "p99": rb.percentile(samples, 0.99),
+            "p50": rb.percentile(samples, 0.50),
+            "mean": statistics.fmean(samples),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Event-loop lag of FunCode canvas routes")
+    parser.add_argument("--size", default="4k", choices=list(rb.SIZES))
+    parser.add_argument("--requests", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.005, help="heartbeat interval in seconds")
+    parser.add_argument("--output", default="")
+    args = parser.parse_args(argv)
+
+    input_dir = tempfile.mkdtemp(prefix="funcode_lag_")
+    try:
+        rb.install_stubs(input_dir)
+        rb.import_package()
+        import server
+
+        canvas = sys.modules[rb.PACKAGE_NAME + ".image.canvas_nodes"]
+        if not hasattr(canvas, "funcode_canvas_export"):
+            raise SystemExit("aiohttp is required to exercise the canvas routes")
+        width, height = rb.SIZES[args.size]
+        data_url = make_data_url(width, height)
+        report = asyncio.run(run(canvas, server, data_url, args.requests, args.interval))
+        report["size"] = [width, height]
+    finally:
+        shutil.rmtree(input_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
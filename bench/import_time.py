@@ -0,0 +1,92 @@
+"""包导入耗时基准（python -X importtime）。
+
+在干净的子进程中导入 ComfyUI_FunCode（folder_paths / server 用桩替代），
+汇总本包各模块的累计导入耗时，以及导入过程中被顺带加载的重量级依赖。
+
+    python bench/import_time.py
+    python bench/import_time.py --runs 5 --output import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ("torch", "numpy", "PIL", "aiohttp", "folder_paths", "color_matcher")
+
+_CHILD = r"""
+import json, sys, tempfile, time
+sys.path.insert(0, {bench_dir!r})
+import run_benchmarks as rb
+rb.install_stubs(tempfile.mkdtemp(prefix="funcode_import_"))
+before = set(sys.modules)
+start = time.perf_counter()
+rb.import_package()
+elapsed = (time.perf_counter() - start) * 1000.0
+loaded = sorted(m for m in set(sys.modules) - before if m.split(".")[0] in {heavy!r})
+print(json.dumps({{"wall_ms": elapsed, "heavy_loaded": sorted({{m.split(".")[0] for m in loaded}})}}))
+"""
+
+
+def parse_importtime(stderr, prefix):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            continue
+        name = parts[2].strip()
+        if name.startswith(prefix):
+            modules[name] = {"self_us": self_us, "cumulative_us": cumulative_us}
+    return modules
+
+
+def run_once():
+    from run_benchmarks import PACKAGE_NAME
+
+    code = _CHILD.format(bench_dir=BENCH_DIR, heavy=HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["modules"] = parse_importtime(proc.stderr, PACKAGE_NAME)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FunCode package import-time benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default="", help="write JSON results to this path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BENCH_DIR)
+    runs = [run_once() for _ in range(max(args.runs, 1))]
+    walls = [r["wall_ms"] for r in runs]
+    report = {
+        "runs": len(runs),
+        "wall_ms": {"min": min(walls), "median": statistics.median(walls), "max": max(walls)},
+        "heavy_loaded": runs[-1]["heavy_loaded"],
+        "modules": runs[-1]["modules"],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,541 @@
+"""FunCode 节点微基准。
+
+无需启动 ComfyUI：folder_paths / server.PromptServer 以最小桩替代，
+call_llm 指向本地模拟的 OpenAI 兼容服务。结果以 JSON 输出，便于回归对比。
+
+    python bench/run_benchmarks.py --output bench.json
+    python bench/run_benchmarks.py --only load_image,colormatch --sizes 512,1024
+    python bench/run_benchmarks.py --compare bench.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "ComfyUI_FunCode"
+
+SIZES = {
+    "512": (512, 512),
+    "1024": (1024, 1024),
+    "2048": (2048, 2048),
+    "4k": (3840, 2160),
+}
+
+
+def install_stubs(input_dir):
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.get_input_directory = lambda: input_dir
+    folder_paths.get_annotated_filepath = lambda name: os.path.join(input_dir, name)
+    folder_paths.exists_annotated_filepath = lambda name: os.path.exists(os.path.join(input_dir, name))
+    sys.modules["folder_paths"] = folder_paths
+
+    class _Routes:
+        def _register(self, path):
+            return lambda fn: fn
+
+        post = get = put = delete = _register
+
+    class _PromptServer:
+        instance = None
+
+        def __init__(self):
+            self.routes = _Routes()
+            self.events = []
+
+        def send_sync(self, event, data, sid=None):
+            self.events.append(event)
+
+    _PromptServer.instance = _PromptServer()
+    try:
+        # ComfyUI 的 server 模块本身依赖 aiohttp，提前导入以贴近真实启动环境
+        import aiohttp.web  # noqa: F401
+    except Exception:
+        pass
+    server = types.ModuleType("server")
+    server.PromptServer = _PromptServer
+    sys.modules["server"] = server
+
+
+def import_package():
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME,
+        os.path.join(PACKAGE_ROOT, "__init__.py"),
+        submodule_search_locations=[PACKAGE_ROOT],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class _MockLLMHandler(BaseHTTPRequestHandler):
+    # 兼容 OpenAI 的 chat/completions，以及 Batch API 所需的 /files 与 /batches
+    def _send_json(self, obj, status=200):
+        self._send_bytes(json.dumps(obj).encode("utf-8"), "application/json", status)
+
+    def _send_bytes(self, data, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _upload_file(self, body):
+        boundary = self.headers.get("Content-Type", "").split("boundary=")[-1].encode("utf-8")
+        content = b""
+        for part in body.split(b"--" + boundary):
+            if b'name="file"' in part:
+                content = part.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n", 1)[0]
+        file_id = "file-{}".format(len(self.server.files) + 1)
+        self.server.files[file_id] = content
+        self._send_json({"id": file_id, "object": "file", "purpose": "batch", "bytes": len(content)})
+
+    def _create_batch(self, body):
+        request = json.loads(body)
+        lines = []
+        for line in self.server.files.get(request.get("input_file_id"), b"").decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            lines.append(json.dumps({
+                "id": "resp-" + entry["custom_id"],
+                "custom_id": entry["custom_id"],
+                "response": {"status_code": 200, "body": {
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "caption " + entry["custom_id"]}}],
+                }},
+                "error": None,
+            }))
+        output_id = "file-{}".format(len(self.server.files) + 1)
+        self.server.files[output_id] = ("\n".join(lines) + "\n").encode("utf-8")
+        batch_id = "batch-{}".format(len(self.server.batches) + 1)
+        # 首次查询返回 in_progress，第二次起 completed，便于覆盖轮询逻辑
+        self.server.batches[batch_id] = {"id": batch_id, "status": "in_progress", "output_file_id": output_id,
+                                         "request_counts": {"total": len(lines), "completed": 0, "failed": 0}}
+        self._send_json(dict(self.server.batches[batch_id], status="validating"))
+
+    def do_GET(self):
+        parts = self.path.rstrip("/").split("/")
+        if len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in self.server.batches:
+            batch = self.server.batches[parts[-1]]
+            response = dict(batch)
+            if batch["status"] == "in_progress":
+                batch["status"] = "completed"
+                batch["request_counts"]["completed"] = batch["request_counts"]["total"]
+            else:
+                response["status"] = "completed"
+            self._send_json(response)
+            return
+        if len(parts) >= 3 and parts[-1] == "content" and parts[-2] in self.server.files:
+            self._send_bytes(self.server.files[parts[-2]], "application/jsonl")
+            return
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if self.path.rstrip("/").endswith("/files"):
+            self._upload_file(body)
+            return
+        if self.path.rstrip("/").endswith("/batches"):
+            self._create_batch(body)
+            return
+        try:
+            payload = json.loads(body)
+        except Exception:
+            payload = {}
+        response = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "model": payload.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+        }
+        self._send_json(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_llm_server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _MockLLMHandler)
+    httpd.files = {}
+    httpd.batches = {}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return httpd, "http://127.0.0.1:{}/v1".format(httpd.server_address[1])
+
+
+def current_rss_mb():
+    # 当前常驻内存；优先 psutil（跨平台），否则 Linux 读 /proc，其他平台不统计
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "r") as f:
+                pages = int(f.read().split()[1])
+            return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        except Exception:
+            return None
+    return None
+
+
+# 后台线程定期采样 RSS，得到单个用例期间的峰值（ru_maxrss 是整个进程的历史最高值，不能按用例区分）
+class RssSampler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.before = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.before = current_rss_mb()
+        self.peak = self.before
+        if self.before is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+        return False
+
+    def report(self):
+        if self.before is None:
+            return {"rss_before_mb": None, "peak_rss_mb": None, "peak_rss_delta_mb": None}
+        return {
+            "rss_before_mb": self.before,
+            "peak_rss_mb": self.peak,
+            "peak_rss_delta_mb": self.peak - self.before,
+        }
+
+
+def measure(fn, repeat, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples, items):
+    mean = statistics.fmean(samples) if samples else 0.0
+    return {
+        "latency_ms": {
+            "min": min(samples),
+            "p50": percentile(samples, 0.50),
+            "p90": percentile(samples, 0.90),
+            "p99": percentile(samples, 0.99),
+            "max": max(samples),
+            "mean": mean,
+            "stdev": statistics.pstdev(samples) if len(samples) > 1 else 0.0,
+        },
+        "throughput_per_s": (items * 1000.0 / mean) if mean > 0 else 0.0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# 各节点用例：每个函数 yield (case 名称, 参数 dict, 可调用对象, 每次处理的条目数)
+# ---------------------------------------------------------------------------
+
+def _random_image(torch, batch, width, height, channels=3):
+    gen = torch.Generator().manual_seed(0)
+    return torch.rand((batch, height, width, channels), generator=gen, dtype=torch.float32)
+
+
+def bench_load_image(ctx):
+    from PIL import Image
+    import numpy as np
+
+    node = ctx.image.load_image_node.LoadImageFunCodeNode()
+    rng = np.random.default_rng(0)
+    for size_name, (w, h) in ctx.sizes:
+        arr = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+        for fmt, ext in (("PNG", "png"), ("JPEG", "jpg")):
+            name = "bench_{}_{}.{}".format(w, h, ext)
+            Image.fromarray(arr).save(os.path.join(ctx.input_dir, name), format=fmt)
+            yield ("{}-{}".format(fmt.lower(), size_name), {"width": w, "height": h, "format": fmt},
+                   lambda name=name: node.load_image(name), 1)
+            if max(w, h) > 512:
+                # 缩小解码结果会按 (路径, mtime, 大小, max_side) 缓存，这里每次清空以测量解码本身
+                yield ("{}-{}-max512".format(fmt.lower(), size_name),
+                       {"width": w, "height": h, "format": fmt, "max_side": 512},
+                       lambda name=name: (ctx.image.load_image_node._reduced_cache_clear(),
+                                          node.load_image(name, max_side=512)), 1)
+
+
+def bench_colormatch(ctx):
+    try:
+        import color_matcher  # noqa: F401
+    except Exception:
+        ctx.skip("colormatch", "color-matcher not installed")
+        return
+    node = ctx.image.color_match_node.ColorMatchFunCodeNode()
+    for size_name, (w, h) in ctx.sizes:
+        for batch in ctx.batches:
+            ref = _random_image(ctx.torch, 1, w, h)
+            target = _random_image(ctx.torch, batch, w, h)
+            for method in ("mkl", "reinhard", "hm"):
+                yield ("{}-{}-b{}".format(method, size_name, batch),
+                       {"width": w, "height": h, "batch": batch, "method": method},
+                       lambda ref=ref, target=target, method=method: node.colormatch(ref, target, method),
+                       batch)
+            for method in ("mkl", "reinhard"):
+                for lut_mode in ("cached", "frozen"):
+                    yield ("{}-lut-{}-{}-b{}".format(method, lut_mode, size_name, batch),
+                           {"width": w, "height": h, "batch": batch, "method": method, "lut_mode": lut_mode},
+                           lambda ref=ref, target=target, method=method, lut_mode=lut_mode: node.colormatch(
+                               ref, target, method, lut_mode=lut_mode),
+                           batch)
+
+
+def bench_empty_latent(ctx):
+    node = ctx.image.empty_latent_node.EmptyLatentFunCodeNode()
+    for label in ("SDXL - 1024×1024 - [1:1]", "Flux - 1024×1024 - [1:1]", "Wan2.2 - 720×1280 - [9:16]"):
+        for batch in ctx.batches:
+            for broadcast in (False, True):
+                yield ("{}-b{}{}".format(label.split(" - ")[0], batch, "-broadcast" if broadcast else ""),
+                       {"resolution": label, "batch": batch, "broadcast": broadcast},
+                       lambda label=label, batch=batch, broadcast=broadcast: node.generate(
+                           label, batch, 1024, 1024, False, broadcast=broadcast),
+                       batch)
+
+
+# 最近预设的回归用例：(族, 宽, 高) -> 期望的 (宽, 高)
+NEAREST_RESOLUTION_EXPECTED = [
+    ("all", 1088, 1920, (1080, 1920)),
+    ("all", 1090, 1920, (1080, 1920)),
+    ("all", 1920, 1088, (1920, 1080)),
+    ("Wan2.2", 1088, 1920, (720, 1280)),
+    ("all", 540, 960, (544, 960)),
+    ("all", 1024, 1024, (1024, 1024)),
+]
+
+
+def check_nearest_resolution(node):
+    for family, w, h, expected in NEAREST_RESOLUTION_EXPECTED:
+        label, pw, ph = node.match(family, w, h)
+        if (pw, ph) != expected:
+            raise AssertionError("nearest({}, {}, {}) -> {} {}x{}, expected {}x{}".format(
+                family, w, h, label, pw, ph, expected[0], expected[1]))
+
+
+def bench_nearest_resolution(ctx):
+    node = ctx.image.nearest_resolution_node.NearestResolutionFunCodeNode()
+    check_nearest_resolution(node)
+    for size_name, (w, h) in ctx.sizes:
+        yield ("nearest-{}".format(size_name), {"width": w, "height": h},
+               lambda w=w, h=h: node.match("all", w, h), 1)
+
+
+def bench_canvas_data(ctx):
+    canvas = ctx.image.canvas_nodes
+    node = canvas.CanvasDataFunCodeNode()
+    for size_name, (w, h) in ctx.sizes:
+        image = _random_image(ctx.torch, 1, w, h)
+        yield ("tensor_to_b64-{}".format(size_name), {"width": w, "height": h},
+               lambda image=image: canvas._tensor_to_b64(image), 1)
+        overlays = {"overlay{}".format(i): image for i in range(1, 4)}
+        yield ("build-bg+3-{}".format(size_name), {"width": w, "height": h, "layers": 4},
+               lambda image=image, overlays=overlays: node.build(image, **overlays), 4)
+        # 背景 + overlay1~10：对比逐层串行编码与线程池并行编码（及快速编码方式）
+        overlays = {"overlay{}".format(i): image for i in range(1, 11)}
+        yield ("build-bg+10-{}-serial".format(size_name), {"width": w, "height": h, "layers": 11, "codec": "png"},
+               lambda image=image: [canvas._tensor_to_b64(image) for _ in range(11)], 11)
+        for codec in ("png", "png_fast", "webp", "jpeg_lossy"):
+            yield ("build-bg+10-{}-{}".format(size_name, codec),
+                   {"width": w, "height": h, "layers": 11, "codec": codec},
+                   lambda image=image, overlays=overlays, codec=codec: node.build(
+                       image, preview_codec=codec, **overlays), 11)
+
+
+def bench_image_to_data_url(ctx):
+    llm = ctx.llm.any_llm_node
+    for size_name, (w, h) in ctx.sizes:
+        image = _random_image(ctx.torch, 1, w, h)
+        yield ("data_url-{}".format(size_name), {"width": w, "height": h},
+               lambda image=image: llm.image_to_data_url(image), 1)
+
+
+def bench_call_llm(ctx):
+    llm = ctx.llm.any_llm_node
+    yield ("text-only", {"image": None},
+           lambda: llm.call_llm(ctx.llm_base, "", "bench", "", "hello", None, 0.7, 1.0, 16, 10), 1)
+    for size_name, (w, h) in ctx.sizes:
+        image = _random_image(ctx.torch, 1, w, h)
+        yield ("image-{}".format(size_name), {"width": w, "height": h},
+               lambda image=image: llm.call_llm(ctx.llm_base, "", "bench", "", "describe", image, 0.7, 1.0, 16, 10),
+               1)
+
+
+def bench_llm_batch(ctx):
+    batch_job = ctx.llm.batch_job
+    for batch in ctx.batches:
+        image = _random_image(ctx.torch, batch, 256, 256)
+        sources = [("image-{:05d}".format(i), "image-{:05d}".format(i), batch_job._tensor_fingerprint(image[i]))
+                   for i in range(batch)]
+
+        def run(image=image, sources=sources):
+            # 每次使用新的任务目录，测量完整的 编码写分片 -> 上传 -> 提交 -> 轮询 -> 取回 流程
+            jobs_dir = tempfile.mkdtemp(dir=ctx.input_dir)
+            root = batch_job.normalize_api_root(ctx.llm_base)
+            endpoint = batch_job.batch_endpoint(root)
+            job = batch_job.BatchJob.open({"model": "bench"}, sources, jobs_dir)
+            job.write_shards(
+                batch_job.build_batch_line(endpoint, "bench", "", "describe", cid,
+                                           ctx.llm.any_llm_node.image_to_data_url(image[i]), 0.7, 1.0, 16)
+                for i, (cid, _, _) in enumerate(sources))
+            job.run(root, "", 10, 0, 10)
+            assert job.done and len(job.ordered_results()) == len(sources)
+
+        yield ("job-b{}".format(batch), {"batch": batch, "width": 256, "height": 256}, run, batch)
+
+
+BENCHMARKS = {
+    "load_image": bench_load_image,
+    "colormatch": bench_colormatch,
+    "empty_latent": bench_empty_latent,
+    "nearest_resolution": bench_nearest_resolution,
+    "canvas_data": bench_canvas_data,
+    "image_to_data_url": bench_image_to_data_url,
+    "call_llm": bench_call_llm,
+    "llm_batch": bench_llm_batch,
+}
+
+
+class Context:
+    def __init__(self, package, input_dir, llm_base, sizes, batches):
+        import torch
+
+        self.torch = torch
+        self.package = package
+        self.image = sys.modules[PACKAGE_NAME + ".image"]
+        self.llm = sys.modules[PACKAGE_NAME + ".llm"]
+        self.input_dir = input_dir
+        self.llm_base = llm_base
+        self.sizes = sizes
+        self.batches = batches
+        self.skipped = []
+
+    def skip(self, bench, reason):
+        self.skipped.append({"benchmark": bench, "reason": reason})
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base = {(r["benchmark"], r["case"]): r for r in baseline.get("results", [])}
+    print("{:<22} {:<32} {:>10} {:>10} {:>8}".format("benchmark", "case", "base p50", "p50", "ratio"))
+    for r in current["results"]:
+        old = base.get((r["benchmark"], r["case"]))
+        if not old:
+            continue
+        old_p50 = old["latency_ms"]["p50"]
+        new_p50 = r["latency_ms"]["p50"]
+        ratio = new_p50 / old_p50 if old_p50 else float("nan")
+        print("{:<22} {:<32} {:>10.2f} {:>10.2f} {:>7.2f}x".format(r["benchmark"], r["case"], old_p50, new_p50, ratio))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="FunCode node micro-benchmarks")
+    parser.add_argument("--only", default="", help="comma separated benchmark names ({})".format(",".join(BENCHMARKS)))
+    parser.add_argument("--sizes", default=",".join(SIZES), help="comma separated sizes ({})".format(",".join(SIZES)))
+    parser.add_argument("--batches", default="1,4", help="comma separated batch sizes")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", default="", help="write JSON results to this path (default: stdout)")
+    parser.add_argument("--compare", default="", help="baseline JSON to compare p50 latency against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise SystemExit("unknown benchmark(s): {}".format(", ".join(unknown)))
+    sizes = [(s, SIZES[s]) for s in args.sizes.split(",") if s in SIZES]
+    batches = [int(b) for b in args.batches.split(",") if b]
+
+    input_dir = tempfile.mkdtemp(prefix="funcode_bench_")
+    httpd, llm_base = start_mock_llm_server()
+    try:
+        install_stubs(input_dir)
+        package = import_package()
+        ctx = Context(package, input_dir, llm_base, sizes, batches)
+        results = []
+        for name in names:
+            for case, params, fn, items in BENCHMARKS[name](ctx):
+                with RssSampler() as rss:
+                    samples = measure(fn, args.repeat, args.warmup)
+                entry = {"benchmark": name, "case": case, "params": params, "repeat": args.repeat}
+                entry.update(summarize(samples, items))
+                entry.update(rss.report())
+                results.append(entry)
+                print("{:<22} {:<32} p50 {:>9.2f} ms".format(name, case, entry["latency_ms"]["p50"]), file=sys.stderr)
+    finally:
+        httpd.shutdown()
+        shutil.rmtree(input_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "torch": getattr(ctx.torch, "__version__", ""),
+            "cpu_count": os.cpu_count(),
+        },
+        "skipped": ctx.skipped,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        compare(report, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
 from .load_image_node import LoadImageFunCodeNode
 from .color_match_node import ColorMatchFunCodeNode
 from .empty_latent_node import EmptyLatentFunCodeNode
+from .nearest_resolution_node import NearestResolutionFunCodeNode
 from .canvas_nodes import CanvasDataFunCodeNode, CanvasEditorFunCodeNode
 
 NODE_CLASS_MAPPINGS = {
     "LoadImageFunCodeNode": LoadImageFunCodeNode,
     "ColorMatchFunCodeNode": ColorMatchFunCodeNode,
     "EmptyLatentFunCodeNode": EmptyLatentFunCodeNode,
+    "NearestResolutionFunCodeNode": NearestResolutionFunCodeNode,
     "CanvasDataFunCodeNode": CanvasDataFunCodeNode,
     "CanvasEditorFunCodeNode": CanvasEditorFunCodeNode
 }
@@ -15,6 +17,7 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "LoadImageFunCodeNode": "Load Image FunCode",
     "ColorMatchFunCodeNode": "Color Match FunCode",
     "EmptyLatentFunCodeNode": "Empty Latent FunCode",
+    "NearestResolutionFunCodeNode": "Nearest Resolution FunCode",
     "CanvasDataFunCodeNode": "Canvas Data FunCode",
     "CanvasEditorFunCodeNode": "Canvas Editor FunCode"
 }
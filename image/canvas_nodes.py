@@ -2,11 +2,98 @@ import os
 import json
 import base64
 import time
+import asyncio
+import threading
 from io import BytesIO
-import numpy as np
-import torch
-from PIL import Image
-import folder_paths
+
+# 画布导出/保存的解码与写盘放到有界线程池，避免阻塞 aiohttp 事件循环
+CANVAS_IO_WORKERS = 2
+# 运行中 + 排队的任务上限，超出直接返回 503，由前端稍后重试
+CANVAS_IO_MAX_PENDING = 8
+
+_canvas_executor = None
+_canvas_pending = 0
+_canvas_export_seq = {}
+
+# CanvasData 传给前端的图层编码：线程池并行，编码方式可选。
+# 前端直接用这些图像搭建画布并导出 Canvas Editor 的 IMAGE 输出，因此除 jpeg_lossy 外均为无损
+CANVAS_ENCODE_WORKERS = max(1, min(8, os.cpu_count() or 1))
+CANVAS_PREVIEW_CODECS = {
+    "png": ("PNG", "image/png", {"compress_level": 6}),
+    "png_fast": ("PNG", "image/png", {"compress_level": 1}),
+    # 无损 WebP，method 0 / quality 0 为最快的无损压缩档
+    "webp": ("WEBP", "image/webp", {"lossless": True, "method": 0, "quality": 0}),
+    "jpeg_lossy": ("JPEG", "image/jpeg", {"quality": 90}),
+}
+_ENCODE_SCRATCH_ELEMENTS = 1 << 20
+
+_encode_executor = None
+_encode_scratch = threading.local()
+
+
+class CanvasBusyError(Exception):
+    pass
+
+
+def _get_canvas_executor():
+    global _canvas_executor
+    if _canvas_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        _canvas_executor = ThreadPoolExecutor(max_workers=CANVAS_IO_WORKERS, thread_name_prefix="funcode_canvas")
+    return _canvas_executor
+
+
+async def _run_canvas_io(fn, *args):
+    # 只在事件循环线程中调用，计数无需加锁
+    global _canvas_pending
+    if _canvas_pending >= CANVAS_IO_MAX_PENDING:
+        raise CanvasBusyError()
+    _canvas_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_canvas_executor(), fn, *args)
+    finally:
+        _canvas_pending -= 1
+
+
+def _strip_data_url(image_b64):
+    if ',' in image_b64:
+        image_b64 = image_b64.split(',')[1]
+    return image_b64
+
+
+def _decode_canvas_image(image_b64):
+    import numpy as np
+    import torch
+    from PIL import Image
+
+    img_bytes = base64.b64decode(_strip_data_url(image_b64))
+    with BytesIO(img_bytes) as bio:
+        img = Image.open(bio)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        arr = np.array(img).astype(np.float32) / 255.0
+    return torch.from_numpy(arr)[None,]
+
+
+def _save_canvas_image(image_b64, filename, options):
+    from PIL import Image
+
+    from .canvas_store import save_canvas
+
+    try:
+        img_bytes = base64.b64decode(_strip_data_url(image_b64))
+        img = Image.open(BytesIO(img_bytes))
+        img.load()
+    except Exception:
+        return None, False, 400
+    try:
+        path, deduplicated = save_canvas(img, filename, options)
+    except Exception:
+        return None, False, 500
+    return path, deduplicated, 200
+
 
 try:
     import aiohttp.web
@@ -23,18 +110,21 @@ try:
         payload = data.get('payload')
         if not node_id or not image_b64:
             return aiohttp.web.json_response({"status": "error"}, status=400)
-        if ',' in image_b64:
-            image_b64 = image_b64.split(',')[1]
+        # 被拒绝（503）的请求不能推进序号，否则仍在处理中的旧导出会被误判为过期而丢弃
+        if _canvas_pending >= CANVAS_IO_MAX_PENDING:
+            return aiohttp.web.json_response({"status": "busy"}, status=503)
+        # 同一节点的多次导出可能乱序完成，只采用最后一次被受理的结果；
+        # 检查与提交之间没有 await，_run_canvas_io 必定受理本次任务
+        seq = _canvas_export_seq.get(node_id, 0) + 1
+        _canvas_export_seq[node_id] = seq
         try:
-            img_bytes = base64.b64decode(image_b64)
-            with BytesIO(img_bytes) as bio:
-                img = Image.open(bio)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                arr = np.array(img).astype(np.float32) / 255.0
-                tensor = torch.from_numpy(arr)[None,]
+            tensor = await _run_canvas_io(_decode_canvas_image, image_b64)
+        except CanvasBusyError:
+            return aiohttp.web.json_response({"status": "busy"}, status=503)
         except Exception:
             return aiohttp.web.json_response({"status": "error"}, status=400)
+        if _canvas_export_seq.get(node_id) != seq:
+            return aiohttp.web.json_response({"status": "superseded"})
         storage = PromptServer.instance._funcode_canvas_storage
         info = storage.get(node_id)
         if not info:
@@ -53,37 +143,29 @@ try:
         filename = data.get('filename') or "canvas.png"
         if not image_b64:
             return aiohttp.web.json_response({"status": "error"}, status=400)
-        if ',' in image_b64:
-            image_b64 = image_b64.split(',')[1]
+        from .canvas_store import normalize_options
+
         try:
-            img_bytes = base64.b64decode(image_b64)
-            img = Image.open(BytesIO(img_bytes))
-        except Exception:
+            options = normalize_options(data.get('format', "png"), data.get('compress_level', 6),
+                                        data.get('quality', 90), data.get('lossless', False))
+        except (TypeError, ValueError):
             return aiohttp.web.json_response({"status": "error"}, status=400)
-        input_dir = folder_paths.get_input_directory()
-        target_dir = os.path.join(input_dir, "FunCodeCanvas")
-        os.makedirs(target_dir, exist_ok=True)
-        safe_name = os.path.basename(filename)
-        path = os.path.join(target_dir, safe_name)
         try:
-            img.save(path, format="PNG")
-        except Exception:
-            return aiohttp.web.json_response({"status": "error"}, status=500)
-        return aiohttp.web.json_response({"status": "ok", "path": f"FunCodeCanvas/{safe_name}"})
+            path, deduplicated, status = await _run_canvas_io(_save_canvas_image, image_b64, filename, options)
+        except CanvasBusyError:
+            return aiohttp.web.json_response({"status": "busy"}, status=503)
+        if path is None:
+            return aiohttp.web.json_response({"status": "error"}, status=status)
+        return aiohttp.web.json_response({"status": "ok", "path": path, "deduplicated": deduplicated})
 
     @PromptServer.instance.routes.get("/funcode/canvas_list")
     async def funcode_canvas_list(request):
-        input_dir = folder_paths.get_input_directory()
-        target_dir = os.path.join(input_dir, "FunCodeCanvas")
-        if not os.path.isdir(target_dir):
-            return aiohttp.web.json_response({"files": []})
-        exts = {'.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tiff', '.gif'}
-        names = []
-        for f in os.listdir(target_dir):
-            p = os.path.join(target_dir, f)
-            if os.path.isfile(p) and os.path.splitext(f)[1].lower() in exts:
-                names.append(f"FunCodeCanvas/{f}")
-        return aiohttp.web.json_response({"files": sorted(names)})
+        from .canvas_store import list_canvas_files
+
+        # 从索引读取；画布目录 mtime 未变时无需遍历目录
+        loop = asyncio.get_running_loop()
+        files, aliases = await loop.run_in_executor(_get_canvas_executor(), list_canvas_files)
+        return aiohttp.web.json_response({"files": files, "aliases": aliases})
 
     @PromptServer.instance.routes.get("/funcode/canvas_payload")
     async def funcode_canvas_payload(request):
@@ -98,15 +180,59 @@ except Exception:
     pass
 
 
-def _tensor_to_b64(t):
-    if len(t.shape) == 3:
-        t = t.unsqueeze(0)
-    arr = np.clip(t[0].cpu().numpy() * 255, 0, 255).astype(np.uint8)
-    if arr.shape[-1] == 1:
-        arr = np.repeat(arr, 3, axis=-1)
+def _get_encode_executor():
+    global _encode_executor
+    if _encode_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        _encode_executor = ThreadPoolExecutor(max_workers=CANVAS_ENCODE_WORKERS, thread_name_prefix="funcode_encode")
+    return _encode_executor
+
+
+def _to_uint8(t):
+    import numpy as np
+
+    if len(t.shape) == 4:
+        t = t[0]
+    arr = t.detach().cpu().numpy()
+    out = np.empty(arr.shape, dtype=np.uint8)
+    # 按行分块转换，每个线程复用一块小的 float32 缓冲区，避免整图大小的临时数组
+    row_size = max(1, int(np.prod(arr.shape[1:])))
+    rows = max(1, _ENCODE_SCRATCH_ELEMENTS // row_size)
+    scratch = getattr(_encode_scratch, "buf", None)
+    if scratch is None or scratch.size < rows * row_size:
+        scratch = np.empty(rows * row_size, dtype=np.float32)
+        _encode_scratch.buf = scratch
+    for start in range(0, arr.shape[0], rows):
+        chunk = arr[start:start + rows]
+        tmp = scratch[:chunk.size].reshape(chunk.shape)
+        np.multiply(chunk, 255, out=tmp)
+        np.clip(tmp, 0, 255, out=tmp)
+        # 与原先 astype(np.uint8) 一致：截断取整
+        np.copyto(out[start:start + rows], tmp, casting="unsafe")
+    return out
+
+
+def _tensor_to_b64(t, codec="png"):
+    from PIL import Image
+
+    arr = _to_uint8(t)
+    # 单通道直接编码为灰度图，省去 np.repeat 扩成三通道
+    img = Image.fromarray(arr[..., 0], "L") if arr.shape[-1] == 1 else Image.fromarray(arr)
+    fmt, mime, params = CANVAS_PREVIEW_CODECS.get(codec, CANVAS_PREVIEW_CODECS["png"])
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        # JPEG 不支持透明通道，带 alpha 的图层退回快速 PNG
+        fmt, mime, params = CANVAS_PREVIEW_CODECS["png_fast"]
     buf = BytesIO()
-    Image.fromarray(arr).save(buf, format="PNG")
-    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("utf-8")
+    img.save(buf, format=fmt, **params)
+    return "data:{};base64,".format(mime) + base64.b64encode(buf.getbuffer()).decode("ascii")
+
+
+def _encode_layers(tensors, codec="png"):
+    # PIL 编码期间释放 GIL，各图层在线程池中并行转换与编码，结果保持输入顺序
+    if len(tensors) <= 1 or CANVAS_ENCODE_WORKERS <= 1:
+        return [_tensor_to_b64(t, codec) for t in tensors]
+    return list(_get_encode_executor().map(lambda t: _tensor_to_b64(t, codec), tensors))
 
 
 def _merge_layer_transforms(payload, previous_payload):
@@ -164,6 +290,8 @@ class CanvasDataFunCodeNode:
                 "overlay8": ("IMAGE",),
                 "overlay9": ("IMAGE",),
                 "overlay10": ("IMAGE",),
+                # 传给前端画布的图层编码；png_fast / webp 无损且更快，jpeg_lossy 有损，会降低最终合成图质量
+                "preview_codec": (list(CANVAS_PREVIEW_CODECS), {"default": "png"}),
             }
         }
 
@@ -172,12 +300,9 @@ class CanvasDataFunCodeNode:
     RETURN_NAMES = ("canvas_data",)
     FUNCTION = "build"
 
-    def build(self, bg_image, **kwargs):
+    def build(self, bg_image, preview_codec="png", **kwargs):
         data = {"background": None, "layers": []}
-        bi = _tensor_to_b64(bg_image)
-        h = int(bg_image.shape[1])
-        w = int(bg_image.shape[2])
-        data["background"] = {"id": 0, "image": bi, "size": {"height": h, "width": w}}
+        layers = []
         for k, v in kwargs.items():
             if v is None:
                 continue
@@ -192,8 +317,13 @@ class CanvasDataFunCodeNode:
                     lid = int(k.replace("overlay", ""))
             except ValueError:
                 continue
-                
-            vi = _tensor_to_b64(v)
+            layers.append((lid, v))
+        # 背景与全部图层一次性提交编码
+        encoded = _encode_layers([bg_image] + [v for _, v in layers], preview_codec)
+        h = int(bg_image.shape[1])
+        w = int(bg_image.shape[2])
+        data["background"] = {"id": 0, "image": encoded[0], "size": {"height": h, "width": w}}
+        for (lid, v), vi in zip(layers, encoded[1:]):
             lh = int(v.shape[1])
             lw = int(v.shape[2])
             data["layers"].append({"id": lid, "image": vi, "size": {"height": lh, "width": lw}})
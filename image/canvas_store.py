@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+# input/FunCodeCanvas 的内容寻址存储：相同像素 + 相同编码设置只落盘一次，
+# 客户端传来的文件名记为别名；索引放在 input 目录下（不放进画布目录本身，
+# 这样画布目录的 mtime 只因图片增删而变化，可用一次 stat 判断索引是否过期）
+CANVAS_DIR_NAME = "FunCodeCanvas"
+INDEX_FILE_NAME = "FunCodeCanvas.index.json"
+CANVAS_FORMATS = ("png", "webp", "jpeg")
+_image_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tiff', '.gif'}
+_format_extensions = {"png": ".png", "webp": ".webp", "jpeg": ".jpg"}
+
+_index_lock = threading.Lock()
+_index_cache = {}
+# 正在编码中的文件名（完整路径）：只保存在内存中，_rescan 不会清掉
+_reserved = set()
+
+
+def canvas_dir():
+    import folder_paths
+
+    return os.path.join(folder_paths.get_input_directory(), CANVAS_DIR_NAME)
+
+
+def _index_path():
+    import folder_paths
+
+    return os.path.join(folder_paths.get_input_directory(), INDEX_FILE_NAME)
+
+
+def pixel_hash(img):
+    h = hashlib.blake2b(digest_size=16)
+    h.update("{}:{}x{}".format(img.mode, img.width, img.height).encode("utf-8"))
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def normalize_options(fmt="png", compress_level=6, quality=90, lossless=False):
+    fmt = str(fmt or "png").lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in CANVAS_FORMATS:
+        raise ValueError("CanvasEditorFunCodeNode: unsupported save format {}".format(fmt))
+    return {
+        "format": fmt,
+        "compress_level": min(9, max(0, int(compress_level))),
+        "quality": min(100, max(1, int(quality))),
+        "lossless": bool(lossless),
+    }
+
+
+def encode_tag(options):
+    # 无损编码的像素结果与压缩级别无关，因此 PNG 各级别、WebP 无损互相可去重
+    fmt = options["format"]
+    if fmt == "png":
+        return "png"
+    if fmt == "webp" and options["lossless"]:
+        return "webp-lossless"
+    return "{}-q{}".format(fmt, options["quality"])
+
+
+def _save_kwargs(options):
+    fmt = options["format"]
+    if fmt == "png":
+        return {"format": "PNG", "compress_level": options["compress_level"]}
+    if fmt == "webp":
+        return {"format": "WEBP", "quality": options["quality"], "lossless": options["lossless"], "method": 4}
+    return {"format": "JPEG", "quality": options["quality"], "optimize": False}
+
+
+def _dir_mtime(directory):
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _empty_index():
+    return {"version": 1, "dir_mtime": None, "files": {}, "aliases": {}, "hashes": {}}
+
+
+def _read_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if isinstance(index, dict) and all(isinstance(index.get(k), dict) for k in ("files", "aliases", "hashes")):
+            return index
+    except Exception:
+        pass
+    return _empty_index()
+
+
+def _write_index(path, index):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _rescan(directory, index):
+    # 目录被外部修改过：补登记新文件（不计算哈希），移除已删除的文件与别名
+    present = set()
+    if os.path.isdir(directory):
+        with os.scandir(directory) as it:
+            for entry in it:
+                if os.path.splitext(entry.name)[1].lower() in _image_extensions and entry.is_file():
+                    present.add(entry.name)
+    files = index["files"]
+    for name in list(files):
+        if name not in present:
+            del files[name]
+    for name in present:
+        if name not in files:
+            files[name] = {"hash": None, "encode": None, "created": None}
+    index["aliases"] = {a: t for a, t in index["aliases"].items() if t in files}
+    index["hashes"] = {k: t for k, t in index["hashes"].items() if t in files}
+
+
+def _load_index():
+    # 调用方持有 _index_lock
+    path = _index_path()
+    directory = canvas_dir()
+    index = _index_cache.get(path)
+    if index is None:
+        index = _read_index(path)
+        _index_cache[path] = index
+    dir_mtime = _dir_mtime(directory)
+    if index.get("dir_mtime") != dir_mtime:
+        _rescan(directory, index)
+        index["dir_mtime"] = dir_mtime
+        try:
+            _write_index(path, index)
+        except OSError:
+            pass
+    return path, directory, index
+
+
+def _name_taken(directory, files, name):
+    path = os.path.join(directory, name)
+    return name in files or path in _reserved or os.path.exists(path)
+
+
+def _file_stat(path):
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+def _entry_intact(directory, files, name):
+    # 原地覆盖不会改变目录 mtime：去重命中前核对文件本身的大小与 mtime
+    entry = files.get(name)
+    return entry is not None and entry.get("stat") is not None and entry["stat"] == _file_stat(os.path.join(directory, name))
+
+
+def _unique_name(directory, files, stem, ext):
+    name = stem + ext
+    i = 1
+    while _name_taken(directory, files, name):
+        name = "{}_{}{}".format(stem, i, ext)
+        i += 1
+    return name
+
+
+def save_canvas(img, filename, options):
+    safe_name = os.path.basename(filename or "") or "canvas.png"
+    stem = os.path.splitext(safe_name)[0] or "canvas"
+    ext = _format_extensions[options["format"]]
+    if options["format"] == "jpeg" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    digest = pixel_hash(img)
+    tag = encode_tag(options)
+
+    with _index_lock:
+        path, directory, index = _load_index()
+        key = "{}:{}".format(digest, tag)
+        existing = index["hashes"].get(key)
+        if existing is not None and not _entry_intact(directory, index["files"], existing):
+            del index["hashes"][key]
+            if existing in index["files"]:
+                index["files"][existing]["hash"] = None
+            existing = None
+        if existing is None:
+            # 先在内存中占位文件名，编码在锁外进行，不阻塞其他保存/列表请求
+            os.makedirs(directory, exist_ok=True)
+            stored = _unique_name(directory, index["files"], stem, ext)
+            _reserved.add(os.path.join(directory, stored))
+        else:
+            stored = existing
+
+    if existing is None:
+        target = os.path.join(directory, stored)
+        tmp = os.path.join(directory, ".{}.{}.tmp".format(stored, uuid.uuid4().hex))
+        try:
+            img.save(tmp, **_save_kwargs(options))
+            os.replace(tmp, target)
+        except Exception:
+            with _index_lock:
+                _reserved.discard(target)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    with _index_lock:
+        # 重新加载：编码期间其他进程增删的文件由 _rescan 补登记，不会被当前目录 mtime 掩盖
+        path, directory, index = _load_index()
+        if existing is None:
+            target = os.path.join(directory, stored)
+            _reserved.discard(target)
+            index["files"][stored] = {"hash": digest, "encode": tag, "created": time.time(),
+                                      "size": [img.width, img.height], "stat": _file_stat(target)}
+            index["hashes"][key] = stored
+        alias = stem + ext
+        if alias != stored and alias not in index["files"]:
+            index["aliases"][alias] = stored
+        _write_index(path, index)
+    return "{}/{}".format(CANVAS_DIR_NAME, stored), existing is not None
+
+
+def list_canvas_files():
+    with _index_lock:
+        _path, _directory, index = _load_index()
+        files = sorted("{}/{}".format(CANVAS_DIR_NAME, n) for n in index["files"])
+        aliases = {"{}/{}".format(CANVAS_DIR_NAME, a): "{}/{}".format(CANVAS_DIR_NAME, t)
+                   for a, t in index["aliases"].items()}
+    return files, aliases
@@ -0,0 +1,229 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# 可烘焙为 3D LUT 的全局（逐像素只依赖颜色）方法
+LUT_METHODS = ("reinhard", "mvgd", "mkl")
+
+LUT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "lut_cache")
+LUT_MEMORY_ENTRIES = 16
+# 磁盘缓存只保存冻结风格的 LUT（每张参考图一个），超出容量时按最近使用时间淘汰
+LUT_DISK_MAX_BYTES = 64 * 1024 * 1024
+
+_memory_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def content_hash(arr):
+    import numpy as np
+
+    arr = np.ascontiguousarray(arr, dtype=np.float32)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(arr.shape).encode("utf-8"))
+    h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def lattice(size):
+    import numpy as np
+
+    axis = np.linspace(0.0, 1.0, size, dtype=np.float64)
+    r, g, b = np.meshgrid(axis, axis, axis, indexing="ij")
+    return np.stack([r, g, b], axis=-1)
+
+
+def _reinhard_mapping(src, ref):
+    import numpy as np
+    from color_matcher.reinhard_matcher import LMS_MAT, LMS_MAT_INV
+
+    # 与 color_matcher.ReinhardMatcher 相同的 log-LMS / Lab 统计，但拆成 拟合 + 逐点映射
+    b = np.array([[1 / np.sqrt(3), 0, 0], [0, 1 / np.sqrt(6), 0], [0, 0, 1 / np.sqrt(2)]])
+    c = np.array([[1, 1, 1], [1, 1, -2], [1, -1, 0]])
+    to_lab = b @ c
+    to_lms = c.T @ b
+
+    def lab(pixels):
+        pixels = pixels.reshape(-1, 3).T.astype(np.float64)
+        pixels = np.where(pixels == 0, 1 / (2 ** 8 - 1), pixels)
+        return to_lab @ np.log10(LMS_MAT @ pixels)
+
+    lab_src = lab(src)
+    lab_ref = lab(ref)
+    mean_src, std_src = lab_src.mean(axis=1), lab_src.std(axis=1)
+    mean_ref, std_ref = lab_ref.mean(axis=1), lab_ref.std(axis=1)
+    ratios = std_ref / std_src
+
+    def mapping(points):
+        res = ((lab(points).T - mean_src) * ratios + mean_ref).T
+        return (LMS_MAT_INV @ (10 ** (to_lms @ res))).T
+
+    return mapping
+
+
+def _mvgd_mapping(src, ref, method):
+    import numpy as np
+    from color_matcher import ColorMatcher
+
+    # 与节点原逻辑一致：用 ColorMatcher 拟合，再取出线性变换
+    cm = ColorMatcher()
+    cm.transfer(src=src.copy(), ref=ref, method=method)
+    mat, mu_r, mu_z = np.array(cm.transfer_mat), np.array(cm.mu_r), np.array(cm.mu_z)
+
+    def mapping(points):
+        return (mat @ (points.reshape(-1, 3).T - mu_r) + mu_z).T
+
+    return mapping
+
+
+def bake_lut(src, ref, method, size=33):
+    import numpy as np
+
+    if method not in LUT_METHODS:
+        raise ValueError("ColorMatchNode: LUT mode only supports {}".format(", ".join(LUT_METHODS)))
+    if method == "reinhard":
+        mapping = _reinhard_mapping(src, ref)
+    else:
+        mapping = _mvgd_mapping(src, ref, method)
+    grid = lattice(size)
+    return np.ascontiguousarray(mapping(grid).reshape(size, size, size, 3), dtype=np.float32)
+
+
+def apply_lut(image, lut, domain_min=(0.0, 0.0, 0.0), domain_max=(1.0, 1.0, 1.0)):
+    import numpy as np
+    import torch
+    import torch.nn.functional as F
+
+    # lut 索引顺序为 [r, g, b]；grid_sample 的 5D 三线性插值坐标顺序为 (W, H, D) = (b, g, r)
+    lo = np.asarray(domain_min, dtype=np.float32)
+    hi = np.asarray(domain_max, dtype=np.float32)
+    coords = (np.asarray(image, dtype=np.float32) - lo) / (hi - lo)
+    grid = torch.from_numpy(np.ascontiguousarray(coords)).flip(-1).mul_(2.0).sub_(1.0)
+    grid = grid.reshape(1, 1, -1, 1, 3)
+    volume = torch.from_numpy(np.ascontiguousarray(lut, dtype=np.float32)).permute(3, 0, 1, 2).unsqueeze(0)
+    out = F.grid_sample(volume, grid, mode="bilinear", padding_mode="border", align_corners=True)
+    return out[0, :, 0, :, 0].T.reshape(image.shape).numpy()
+
+
+def _cache_path(key):
+    return os.path.join(LUT_CACHE_DIR, key + ".npy")
+
+
+def get_cached_lut(key):
+    import numpy as np
+
+    with _cache_lock:
+        lut = _memory_cache.get(key)
+        if lut is not None:
+            _memory_cache.move_to_end(key)
+            return lut
+    path = _cache_path(key)
+    if not os.path.isfile(path):
+        return None
+    try:
+        lut = np.load(path)
+        os.utime(path)
+    except Exception:
+        return None
+    _remember(key, lut)
+    return lut
+
+
+def store_lut(key, lut, persist=True):
+    import numpy as np
+
+    _remember(key, lut)
+    if not persist:
+        return
+    try:
+        os.makedirs(LUT_CACHE_DIR, exist_ok=True)
+        tmp = _cache_path(key) + ".tmp.npy"
+        np.save(tmp, lut)
+        os.replace(tmp, _cache_path(key))
+        _prune_disk_cache()
+    except Exception:
+        pass
+
+
+def _prune_disk_cache():
+    entries = []
+    with os.scandir(LUT_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".npy") and entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= LUT_DISK_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def _remember(key, lut):
+    with _cache_lock:
+        _memory_cache[key] = lut
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > LUT_MEMORY_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+
+def lut_cache_key(ref, method, size, target=None):
+    # 拟合结果同时依赖参考图与目标图的统计量；target 为 None 表示冻结风格（只按参考图复用）
+    if target is None:
+        return "{}_{}_{}".format(content_hash(ref), method, int(size))
+    return "{}_{}_{}_{}".format(content_hash(ref), content_hash(target), method, int(size))
+
+
+def write_cube(path, lut, title="FunCode Color Match"):
+    size = lut.shape[0]
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('TITLE "{}"\n'.format(title))
+        f.write("LUT_3D_SIZE {}\n".format(size))
+        f.write("DOMAIN_MIN 0.0 0.0 0.0\n")
+        f.write("DOMAIN_MAX 1.0 1.0 1.0\n")
+        # .cube 中红色分量变化最快
+        for b in range(size):
+            for g in range(size):
+                for r in range(size):
+                    v = lut[r, g, b]
+                    f.write("{:.6f} {:.6f} {:.6f}\n".format(v[0], v[1], v[2]))
+
+
+def read_cube(path):
+    import numpy as np
+
+    size = None
+    domain_min = (0.0, 0.0, 0.0)
+    domain_max = (1.0, 1.0, 1.0)
+    values = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            head = line.split()[0].upper()
+            if head == "TITLE":
+                continue
+            if head == "LUT_3D_SIZE":
+                size = int(line.split()[1])
+                continue
+            if head == "LUT_1D_SIZE":
+                raise ValueError("ColorMatchNode: 1D .cube LUTs are not supported")
+            if head == "DOMAIN_MIN":
+                domain_min = tuple(float(v) for v in line.split()[1:4])
+                continue
+            if head == "DOMAIN_MAX":
+                domain_max = tuple(float(v) for v in line.split()[1:4])
+                continue
+            values.append([float(v) for v in line.split()[:3]])
+    if size is None or len(values) != size ** 3:
+        raise ValueError("ColorMatchNode: invalid .cube file {}".format(path))
+    lut = np.asarray(values, dtype=np.float32).reshape(size, size, size, 3).transpose(2, 1, 0, 3)
+    return np.ascontiguousarray(lut), domain_min, domain_max
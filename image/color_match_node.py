@@ -1,8 +1,22 @@
 import os
 from concurrent.futures import ThreadPoolExecutor
 
-import numpy as np
-import torch
+from ..profiler import bind, profiled, span
+from .color_lut import LUT_METHODS, apply_lut, bake_lut, get_cached_lut, lut_cache_key, read_cube, store_lut, write_cube
+
+
+def _resolve_path(path, base_dir_getter):
+    import folder_paths
+
+    # 只允许 input / output 目录内的相对路径，避免工作流读写任意位置
+    base_dir = os.path.realpath(getattr(folder_paths, base_dir_getter)())
+    path = path.strip()
+    if os.path.isabs(path) or ":" in path or ".." in path.replace("\\", "/").split("/"):
+        raise ValueError("ColorMatchNode: .cube path must be relative to {}: {}".format(base_dir, path))
+    full_path = os.path.realpath(os.path.join(base_dir, path))
+    if os.path.commonpath([base_dir, full_path]) != base_dir:
+        raise ValueError("ColorMatchNode: .cube path must be relative to {}: {}".format(base_dir, path))
+    return full_path
 
 
 class ColorMatchFunCodeNode:
@@ -27,6 +41,13 @@ class ColorMatchFunCodeNode:
             "optional": {
                 "strength": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 10.0, "step": 0.01}),
                 "multithread": ("BOOLEAN", {"default": True}),
+                # cached: 在内存中按 参考图 + 目标图内容 + 方法 复用已烘焙的 LUT，结果与 off 一致；refit: 逐张重新拟合；
+                # frozen: 只按参考图复用（内存 + 磁盘），以首次拟合时的目标图为准，整批套用同一个固定风格
+                "lut_mode": (["off", "cached", "refit", "frozen"], {"default": "off"}),
+                "lut_size": ("INT", {"default": 33, "min": 2, "max": 65, "step": 1}),
+                # 仅限相对路径：导入基于 input 目录，导出基于 output 目录（需 lut_mode 非 off）
+                "cube_import": ("STRING", {"default": ""}),
+                "cube_export": ("STRING", {"default": ""}),
             },
         }
 
@@ -39,16 +60,30 @@ class ColorMatchFunCodeNode:
         "Reference: https://github.com/hahnec/color-matcher/"
     )
 
-    def colormatch(self, image_ref, image_target, method, strength=1.0, multithread=True):
-        try:
-            from color_matcher import ColorMatcher
-        except Exception as exc:
-            raise Exception(
-                "Can't import color-matcher, please install it first: pip install color-matcher"
-            ) from exc
+    @profiled("ColorMatchFunCodeNode")
+    def colormatch(self, image_ref, image_target, method, strength=1.0, multithread=True,
+                   lut_mode="off", lut_size=33, cube_import="", cube_export=""):
+        cube_import = (cube_import or "").strip()
+        cube_export = (cube_export or "").strip()
+        use_lut = lut_mode != "off" or bool(cube_import)
+        if cube_export and (lut_mode == "off" or cube_import):
+            raise ValueError("ColorMatchNode: cube_export requires lut_mode cached/refit/frozen without cube_import")
+        export_path = _resolve_path(cube_export, "get_output_directory") if cube_export else None
+        if use_lut and not cube_import and method not in LUT_METHODS:
+            raise ValueError("ColorMatchNode: LUT mode only supports {}".format(", ".join(LUT_METHODS)))
+        if not cube_import:
+            try:
+                from color_matcher import ColorMatcher
+            except Exception as exc:
+                raise Exception(
+                    "Can't import color-matcher, please install it first: pip install color-matcher"
+                ) from exc
+        import numpy as np
+        import torch
 
-        ref = image_ref.detach().cpu().numpy().astype(np.float32)
-        target = image_target.detach().cpu().numpy().astype(np.float32)
+        with span("to_numpy"):
+            ref = image_ref.detach().cpu().numpy().astype(np.float32)
+            target = image_target.detach().cpu().numpy().astype(np.float32)
 
         if ref.ndim == 3:
             ref = ref[None, ...]
@@ -63,24 +98,96 @@ class ColorMatchFunCodeNode:
 
         strength = float(strength)
 
+        luts = {}
+        domain = ((0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+        if cube_import:
+            lut, dmin, dmax = read_cube(_resolve_path(cube_import, "get_input_directory"))
+            domain = (dmin, dmax)
+            luts = {i: lut for i in range(batch_size)}
+        elif lut_mode == "frozen":
+            # 冻结风格：每张参考图只拟合一次（以对应的第一张目标图为准），整批套用
+            for j in range(ref_batch):
+                key = lut_cache_key(ref[j], method, lut_size)
+                lut = get_cached_lut(key)
+                if lut is None:
+                    try:
+                        with span("fit"):
+                            lut = bake_lut(target[j], ref[j], method, lut_size)
+                    except Exception:
+                        lut = None
+                    if lut is not None:
+                        store_lut(key, lut)
+                luts[j] = lut
+            luts = {i: luts[0 if ref_batch == 1 else i] for i in range(batch_size)}
+
+        def fit_lut(i):
+            # cached / refit：每张目标图各自拟合，结果与处理顺序无关；
+            # cached 只在内存中按 参考图 + 目标图内容 复用（同一输入重复执行），不写磁盘
+            ref_i = ref[0] if ref_batch == 1 else ref[i]
+            key = None
+            if lut_mode == "cached":
+                key = lut_cache_key(ref_i, method, lut_size, target[i])
+                lut = get_cached_lut(key)
+                if lut is not None:
+                    return lut
+            try:
+                with span("fit"):
+                    lut = bake_lut(target[i], ref_i, method, lut_size)
+            except Exception:
+                return None
+            if key is not None:
+                store_lut(key, lut, persist=False)
+            return lut
+
+        def process_lut(i):
+            src = target[i]
+            lut = luts.get(i) if i in luts else fit_lut(i)
+            luts[i] = lut
+            if lut is None:
+                return src
+            with span("apply"):
+                result = apply_lut(src, lut, domain[0], domain[1])
+            with span("blend"):
+                result = src + strength * (result - src)
+                return np.clip(result, 0.0, 1.0)
+
         def process(i):
+            if use_lut:
+                return process_lut(i)
             cm = ColorMatcher()
             src = target[i]
             ref_i = ref[0] if ref_batch == 1 else ref[i]
             try:
-                result = cm.transfer(src=src, ref=ref_i, method=method)
-                result = src + strength * (result - src)
-                return np.clip(result, 0.0, 1.0)
+                # color-matcher 的 transfer 在一次调用内完成拟合与映射，无法拆开计时；
+                # 需要分别看 fit / apply 时使用 LUT 模式
+                with span("transfer"):
+                    result = cm.transfer(src=src, ref=ref_i, method=method)
+                with span("blend"):
+                    result = src + strength * (result - src)
+                    return np.clip(result, 0.0, 1.0)
             except Exception:
                 return src
 
         if multithread and batch_size > 1:
             max_threads = min(os.cpu_count() or 1, batch_size)
             with ThreadPoolExecutor(max_workers=max_threads) as executor:
-                outputs = list(executor.map(process, range(batch_size)))
+                outputs = list(executor.map(bind(process), range(batch_size)))
         else:
             outputs = [process(i) for i in range(batch_size)]
 
-        out = torch.from_numpy(np.stack(outputs, axis=0)).to(torch.float32)
-        out.clamp_(0, 1)
+        if export_path:
+            path = export_path
+            exported = luts if lut_mode != "frozen" else {j: luts[j] for j in range(ref_batch)}
+            for i, lut in sorted(exported.items()):
+                if lut is None:
+                    continue
+                if len(exported) > 1:
+                    root, ext = os.path.splitext(path)
+                    write_cube("{}_{:05d}{}".format(root, i, ext or ".cube"), lut)
+                else:
+                    write_cube(path, lut)
+
+        with span("to_tensor"):
+            out = torch.from_numpy(np.stack(outputs, axis=0)).to(torch.float32)
+            out.clamp_(0, 1)
         return (out,)
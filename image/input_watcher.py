@@ -0,0 +1,203 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+# 监听 input 目录（仅顶层文件），在内存中维护 文件名 -> mtime，
+# 变化时通过 websocket 推送 funcode_input_changed 事件，取代前端轮询与逐文件 stat
+VALID_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tiff', '.gif'}
+POLL_INTERVAL = 2.0
+FLUSH_INTERVAL = 0.25
+# inotify 模式下也定期全量对账：网络盘/容器挂载目录上 watch 能建立但收不到宿主机的事件
+RECONCILE_INTERVAL = 30.0
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def _is_image(name):
+    return os.path.splitext(name)[1].lower() in VALID_EXTENSIONS
+
+
+def _load_inotify():
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except Exception:
+        return None
+
+
+class InputWatcher:
+    def __init__(self, directory):
+        self.directory = os.path.normpath(directory)
+        self.mode = None
+        self._mtimes = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="funcode_input_watcher", daemon=True)
+
+    def start(self):
+        # 不等待首次扫描：大目录/网络盘上扫描可能耗时数秒，调用方可能运行在事件循环中
+        self._thread.start()
+        return self
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=5):
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._mtimes)
+
+    def get(self, name):
+        with self._lock:
+            return self._mtimes.get(name)
+
+    def _scan(self):
+        mtimes = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not _is_image(entry.name):
+                        continue
+                    try:
+                        if entry.is_file():
+                            mtimes[entry.name] = entry.stat().st_mtime
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return mtimes
+
+    def _replace_all(self, mtimes):
+        with self._lock:
+            old = self._mtimes
+            self._mtimes = mtimes
+            for name in set(old) | set(mtimes):
+                if old.get(name) != mtimes.get(name):
+                    self._pending[name] = mtimes.get(name)
+
+    def _update(self, name):
+        if not _is_image(name):
+            return
+        try:
+            path = os.path.join(self.directory, name)
+            mtime = os.stat(path).st_mtime if os.path.isfile(path) else None
+        except OSError:
+            mtime = None
+        with self._lock:
+            if self._mtimes.get(name) == mtime:
+                return
+            if mtime is None:
+                self._mtimes.pop(name, None)
+            else:
+                self._mtimes[name] = mtime
+            self._pending[name] = mtime
+
+    def _flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            changes, self._pending = self._pending, {}
+        try:
+            from server import PromptServer
+
+            PromptServer.instance.send_sync("funcode_input_changed", {"changes": changes})
+        except Exception:
+            pass
+
+    def _run(self):
+        libc = _load_inotify()
+        fd = -1
+        if libc is not None:
+            fd = libc.inotify_init1(_IN_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, self.directory.encode("utf-8"), _WATCH_MASK) < 0:
+                os.close(fd)
+                fd = -1
+        self.mode = "inotify" if fd >= 0 else "poll"
+        with self._lock:
+            self._mtimes = self._scan()
+        self._ready.set()
+        try:
+            if fd >= 0:
+                self._run_inotify(fd)
+            else:
+                self._run_poll()
+        finally:
+            if fd >= 0:
+                os.close(fd)
+
+    def _run_inotify(self, fd):
+        next_reconcile = time.monotonic() + RECONCILE_INTERVAL
+        while not self._stop.is_set():
+            if time.monotonic() >= next_reconcile:
+                self._replace_all(self._scan())
+                next_reconcile = time.monotonic() + RECONCILE_INTERVAL
+            readable, _, _ = select.select([fd], [], [], FLUSH_INTERVAL)
+            if readable:
+                data = os.read(fd, 64 * 1024)
+                offset = 0
+                while offset + _EVENT_HEADER.size <= len(data):
+                    _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+                    offset += length
+                    if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                        # 目录本身被移除：退回轮询模式
+                        self.mode = "poll"
+                        self._run_poll()
+                        return
+                    if mask & _IN_Q_OVERFLOW:
+                        self._replace_all(self._scan())
+                    elif name and not mask & _IN_ISDIR:
+                        self._update(name)
+            self._flush()
+
+    def _run_poll(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            self._replace_all(self._scan())
+            self._flush()
+
+
+def get_input_watcher():
+    global _watcher
+    import folder_paths
+
+    directory = os.path.normpath(folder_paths.get_input_directory())
+    with _watcher_lock:
+        if _watcher is None or _watcher.directory != directory:
+            if _watcher is not None:
+                _watcher.stop()
+            _watcher = InputWatcher(directory).start()
+        return _watcher
+
@@ -1,15 +1,92 @@
 import os
-import folder_paths
-from PIL import Image, ImageOps
-import numpy as np
-import torch
+import threading
+from collections import OrderedDict
+
+from ..profiler import profiled, span
+from .input_watcher import get_input_watcher
+
+# 缩小解码结果的内存缓存：key 为 (路径, mtime, 文件大小, max_side)，按张量总字节数限制容量
+_REDUCED_CACHE_MAX_BYTES = 512 * 1024 * 1024
+_reduced_cache = OrderedDict()
+_reduced_cache_bytes = 0
+_reduced_cache_lock = threading.Lock()
+
+
+def _tensors_nbytes(value):
+    return sum(t.element_size() * t.nelement() for t in value)
+
+
+def _reduced_cache_get(key):
+    with _reduced_cache_lock:
+        value = _reduced_cache.get(key)
+        if value is not None:
+            _reduced_cache.move_to_end(key)
+        return value
+
+
+def _reduced_cache_clear():
+    global _reduced_cache_bytes
+    with _reduced_cache_lock:
+        _reduced_cache.clear()
+        _reduced_cache_bytes = 0
+
+
+def _reduced_cache_put(key, value):
+    global _reduced_cache_bytes
+    size = _tensors_nbytes(value)
+    if size > _REDUCED_CACHE_MAX_BYTES:
+        return
+    with _reduced_cache_lock:
+        old = _reduced_cache.pop(key, None)
+        if old is not None:
+            _reduced_cache_bytes -= _tensors_nbytes(old)
+        _reduced_cache[key] = value
+        _reduced_cache_bytes += size
+        while _reduced_cache_bytes > _REDUCED_CACHE_MAX_BYTES:
+            _, evicted = _reduced_cache.popitem(last=False)
+            _reduced_cache_bytes -= _tensors_nbytes(evicted)
+
+
+def _open_reduced(image_path, max_side):
+    from PIL import Image, ImageOps
+
+    i = Image.open(image_path)
+    reduced = max_side > 0 and max(i.size) > max_side
+    if reduced:
+        scale = max_side / float(max(i.size))
+        target = (max(1, int(round(i.width * scale))), max(1, int(round(i.height * scale))))
+        # JPEG 在 DCT 域按 1/2、1/4、1/8 缩小解码，结果不小于 target；其他格式忽略
+        i.draft(i.mode, target)
+    i = ImageOps.exif_transpose(i)
+    i.load()
+    if max_side > 0 and max(i.size) > max_side:
+        # reducing_gap 先做整数倍 box 缩小，再做一次快速重采样
+        i.thumbnail((max_side, max_side), Image.BICUBIC, reducing_gap=2.0)
+    return i, reduced
+
+async def _ready_input_watcher():
+    import asyncio
+
+    # 首次扫描在监听线程中进行，未完成时在线程池中等待，不阻塞事件循环
+    watcher = get_input_watcher()
+    if not watcher.ready:
+        await asyncio.get_running_loop().run_in_executor(None, watcher.wait_ready, 5)
+    return watcher
 
 try:
     import aiohttp.web
     from server import PromptServer
 
+    @PromptServer.instance.routes.get("/funcode/input_files_mtime")
+    async def funcode_input_files_mtime_snapshot(request):
+        # 整个 input 目录的 mtime 快照；之后的变化由 funcode_input_changed 事件推送
+        watcher = await _ready_input_watcher()
+        return aiohttp.web.json_response({"mtimes": watcher.snapshot(), "mode": watcher.mode})
+
     @PromptServer.instance.routes.post("/funcode/input_files_mtime")
     async def funcode_input_files_mtime(request):
+        import folder_paths
+
         try:
             payload = await request.json()
         except Exception:
@@ -21,11 +98,15 @@ try:
 
         input_dir = folder_paths.get_input_directory()
         input_dir_norm = os.path.normpath(input_dir)
+        known = (await _ready_input_watcher()).snapshot()
 
         mtimes = {}
         for name in filenames:
             if not isinstance(name, str) or not name:
                 continue
+            if name in known:
+                mtimes[name] = known[name]
+                continue
             if os.path.isabs(name) or ":" in name:
                 continue
             normalized = os.path.normpath(name)
@@ -46,12 +127,17 @@ try:
                 continue
 
         return aiohttp.web.json_response({"mtimes": mtimes})
+
+    # 随服务启动监听 input 目录（后台线程，不阻塞加载），新文件无需等到前端请求快照即可推送
+    get_input_watcher()
 except Exception:
     pass
 
 class LoadImageFunCodeNode:
     @classmethod
     def INPUT_TYPES(s):
+        import folder_paths
+
         # 输入目录内的图片列表
         input_dir = folder_paths.get_input_directory()
         # 过滤子目录，避免非法项
@@ -64,6 +150,9 @@ class LoadImageFunCodeNode:
         # 只暴露图片选择，不在节点面板显示预览尺寸
         return {"required":
                     {"image": (sorted(files), {"image_upload": True})},
+                "optional":
+                    # 长边上限，0 表示按原图尺寸解码
+                    {"max_side": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 8})},
                 }
 
     CATEGORY = "FunCode/Image"
@@ -71,39 +160,63 @@ class LoadImageFunCodeNode:
     RETURN_NAMES = ("image", "mask")
     FUNCTION = "load_image"
 
-    def load_image(self, image):
+    @profiled("LoadImageFunCodeNode")
+    def load_image(self, image, max_side=0):
+        import folder_paths
+        import numpy as np
+        import torch
+
         # 读取原图并处理 EXIF 方向
         image_path = folder_paths.get_annotated_filepath(image)
-        # 打开图片并保持 PIL 对象供后续通道判断
-        i = Image.open(image_path)
-        i = ImageOps.exif_transpose(i)
-        # 转 RGB 并归一化到 0~1
-        image = i.convert("RGB")
-        image = np.array(image).astype(np.float32) / 255.0
-        # ComfyUI 期望的批次维度
-        image = torch.from_numpy(image)[None,]
-        # 生成 alpha 反相遮罩
-        if 'A' in i.getbands():
-            # alpha 通道 0~1，并转为反相掩码
-            mask = np.array(i.getchannel('A')).astype(np.float32) / 255.0
-            mask = 1. - torch.from_numpy(mask)
-            # 增加 batch 维度 (1, H, W)
-            mask = mask.unsqueeze(0)
-        else:
-            # 无 alpha 时返回默认空遮罩，大小需与 image 一致 (1, H, W)
-            # image shape is (1, H, W, 3)
-            mask = torch.zeros((1, image.shape[1], image.shape[2]), dtype=torch.float32, device="cpu")
+        max_side = int(max_side or 0)
+        cache_key = None
+        if max_side > 0:
+            st = os.stat(image_path)
+            cache_key = (os.path.abspath(image_path), st.st_mtime, st.st_size, max_side)
+            cached = _reduced_cache_get(cache_key)
+            if cached is not None:
+                return cached
+        with span("decode"):
+            # 打开图片并保持 PIL 对象供后续通道判断
+            i, reduced = _open_reduced(image_path, max_side)
+        if not reduced:
+            # 原图已不超过 max_side：与普通加载相同，不占用缓存
+            cache_key = None
+        with span("convert"):
+            # 转 RGB 并归一化到 0~1
+            image = i.convert("RGB")
+            image = np.array(image).astype(np.float32) / 255.0
+            # ComfyUI 期望的批次维度
+            image = torch.from_numpy(image)[None,]
+        with span("mask"):
+            # 生成 alpha 反相遮罩
+            if 'A' in i.getbands():
+                # alpha 通道 0~1，并转为反相掩码
+                mask = np.array(i.getchannel('A')).astype(np.float32) / 255.0
+                mask = 1. - torch.from_numpy(mask)
+                # 增加 batch 维度 (1, H, W)
+                mask = mask.unsqueeze(0)
+            else:
+                # 无 alpha 时返回默认空遮罩，大小需与 image 一致 (1, H, W)
+                # image shape is (1, H, W, 3)
+                mask = torch.zeros((1, image.shape[1], image.shape[2]), dtype=torch.float32, device="cpu")
+        if cache_key is not None:
+            _reduced_cache_put(cache_key, (image, mask))
         return (image, mask)
 
     @classmethod
-    def IS_CHANGED(s, image):
-        # 以文件更新时间判断变更
+    def IS_CHANGED(s, image, max_side=0):
+        import folder_paths
+
+        # 以文件更新时间判断变更；直接 stat，不依赖监听线程（网络盘/容器挂载目录可能收不到 inotify 事件）
         image_path = folder_paths.get_annotated_filepath(image)
         m = os.path.getmtime(image_path)
         return m
 
     @classmethod
     def VALIDATE_INPUTS(s, image):
+        import folder_paths
+
         # 校验图片文件是否存在
         if not folder_paths.exists_annotated_filepath(image):
             return "Invalid image file: {}".format(image)
@@ -0,0 +1,32 @@
+from .resolution_presets import get_registry
+
+
+class NearestResolutionFunCodeNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        families = ["all"] + get_registry().families()
+        return {
+            "required": {
+                "family": (families,),
+                "width": ("INT", {"default": 1024, "min": 1, "max": 16384, "step": 1}),
+                "height": ("INT", {"default": 1024, "min": 1, "max": 16384, "step": 1}),
+            },
+            "optional": {
+                "image": ("IMAGE",),
+            },
+        }
+
+    CATEGORY = "FunCode/Image"
+    RETURN_TYPES = ("STRING", "INT", "INT")
+    RETURN_NAMES = ("resolution", "width", "height")
+    FUNCTION = "match"
+
+    def match(self, family, width, height, image=None):
+        # 有图像输入时以图像尺寸为准 (B, H, W, C)
+        if image is not None:
+            height = int(image.shape[1])
+            width = int(image.shape[2])
+        result = get_registry().nearest(width, height, None if family == "all" else family)
+        if result is None:
+            raise ValueError("NearestResolutionNode: no presets available for {}".format(family))
+        return result
@@ -0,0 +1,192 @@
+import bisect
+import json
+import math
+import os
+
+
+RESOLUTION_PRESETS = [
+    ("custom", None),
+    ("Mobile - 512\u00d7704 - [8:11]", (512, 704)),
+    ("Mobile - 512\u00d7960 - [9:16]", (512, 960)),
+    ("Mobile - 512\u00d71088 - [16:34]", (512, 1088)),
+    ("Mobile - 640\u00d71280 - [9:16]", (640, 1280)),
+    ("FHD - 1080\u00d71920 - [1080P]", (1080, 1920)),
+    ("QHD - 1440\u00d72560 - [2K]", (1440, 2560)),
+    ("4K UHD - 2160\u00d73840 - [4K]", (2160, 3840)),
+    ("Flux - 1024\u00d71024 - [1:1]", (1024, 1024)),
+    ("Flux - 768\u00d71280 - [3:5]", (768, 1280)),
+    ("Flux - 768\u00d71344 - [9:16]", (768, 1344)),
+    ("Flux - 832\u00d71216 - [2:3]", (832, 1216)),
+    ("Flux - 832\u00d71152 - [13:18]", (832, 1152)),
+    ("Flux - 896\u00d71152 - [7:9]", (896, 1152)),
+    ("Flux - 1024\u00d71536 - [2:3]", (1024, 1536)),
+    ("Flux - 768\u00d71536 - [1:2]", (768, 1536)),
+    ("Flux - 896\u00d71536 - [7:12]", (896, 1536)),
+    ("Qwen - 1328\u00d71328 - [1:1]", (1328, 1328)),
+    ("Qwen - 928\u00d71664 - [9:16]", (928, 1664)),
+    ("Qwen - 1104\u00d71472 - [3:4]", (1104, 1472)),
+    ("Qwen - 1056\u00d71584 - [2:3]", (1056, 1584)),
+    ("ZIT 1024 - 1024\u00d71024 - [1:1]", (1024, 1024)),
+    ("ZIT 1024 - 896\u00d71152 - [7:9]", (896, 1152)),
+    ("ZIT 1024 - 864\u00d71152 - [3:4]", (864, 1152)),
+    ("ZIT 1024 - 832\u00d71248 - [2:3]", (832, 1248)),
+    ("ZIT 1024 - 720\u00d71280 - [9:16]", (720, 1280)),
+    ("ZIT 1024 - 576\u00d71344 - [9:21]", (576, 1344)),
+    ("ZIT 1280 - 1280\u00d71280 - [1:1]", (1280, 1280)),
+    ("ZIT 1280 - 1120\u00d71440 - [7:9]", (1120, 1440)),
+    ("ZIT 1280 - 1104\u00d71472 - [3:4]", (1104, 1472)),
+    ("ZIT 1280 - 1024\u00d71536 - [2:3]", (1024, 1536)),
+    ("ZIT 1280 - 864\u00d71536 - [9:16]", (864, 1536)),
+    ("ZIT 1280 - 720\u00d71680 - [9:21]", (720, 1680)),
+    ("ZIT 1536 - 1536\u00d71536 - [1:1]", (1536, 1536)),
+    ("ZIT 1536 - 1344\u00d71728 - [7:9]", (1344, 1728)),
+    ("ZIT 1536 - 1296\u00d71728 - [3:4]", (1296, 1728)),
+    ("ZIT 1536 - 1248\u00d71872 - [2:3]", (1248, 1872)),
+    ("ZIT 1536 - 1152\u00d72048 - [9:16]", (1152, 2048)),
+    ("ZIT 1536 - 864\u00d72016 - [9:21]", (864, 2016)),
+    ("SDXL - 1024\u00d71024 - [1:1]", (1024, 1024)),
+    ("SDXL - 768\u00d7768 - [1:1]", (768, 768)),
+    ("SDXL - 768\u00d71280 - [3:5]", (768, 1280)),
+    ("SDXL - 768\u00d71152 - [2:3]", (768, 1152)),
+    ("SDXL - 864\u00d71152 - [3:4]", (864, 1152)),
+    ("SDXL - 768\u00d71360 - [9:16]", (768, 1360)),
+    ("SDXL - 896\u00d71152 - [7:9]", (896, 1152)),
+    ("SDXL - 832\u00d71152 - [13:18]", (832, 1152)),
+    ("SDXL - 832\u00d71216 - [13:19]", (832, 1216)),
+    ("SDXL - 768\u00d71344 - [4:7]", (768, 1344)),
+    ("SDXL - 640\u00d71536 - [5:12]", (640, 1536)),
+    ("SDXL - 768\u00d71536 - [1:2]", (768, 1536)),
+    ("SDXL - 896\u00d71536 - [7:12]", (896, 1536)),
+    ("Wan2.2 - 544\u00d7960 - [9:16]", (544, 960)),
+    ("Wan2.2 - 720\u00d71280 - [9:16]", (720, 1280)),
+    ("Wan2.2 - 480\u00d7832 - [15:26]", (480, 832)),
+    ("SD1.5 - 512\u00d7512 - [1:1]", (512, 512)),
+    ("SD1.5 - 768\u00d7768 - [1:1]", (768, 768)),
+    ("SD1.5 - 512\u00d7768 - [2:3]", (512, 768)),
+    ("SD1.5 - 576\u00d7768 - [3:4]", (576, 768)),
+    ("SD1.5 - 512\u00d7912 - [9:16]", (512, 912)),
+]
+
+# 用户自定义预设文件（包根目录），格式：[{"label": "...", "width": 1024, "height": 1024}, ...]
+USER_PRESETS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "resolution_presets.json")
+
+# 最近预设的距离中长宽比的权重：长宽比偏差意味着裁切/变形，比面积偏差代价更高
+ASPECT_WEIGHT = 4.0
+
+_registry = None
+_registry_mtime = None
+
+
+def preset_family(label):
+    # "ZIT 1024 - 1024\u00d71024 - [1:1]" -> "ZIT"
+    return label.split(" - ", 1)[0].strip().split(" ", 1)[0]
+
+
+class PresetRegistry:
+    def __init__(self, presets):
+        self.labels = []
+        self._order = {}
+        self.by_label = {}
+        self.by_family = {}
+        for label, size in presets:
+            if label in self.by_label:
+                continue
+            self._order[label] = len(self.labels)
+            self.labels.append(label)
+            self.by_label[label] = size
+            if size is None:
+                continue
+            self.by_family.setdefault(preset_family(label), []).append(label)
+        # 预计算长宽比索引：每个族一份，None 表示全部预设
+        self._index = {None: self._build_index(l for l in self.labels if self.by_label[l])}
+        for family, labels in self.by_family.items():
+            self._index[family] = self._build_index(labels)
+
+    def _build_index(self, labels):
+        # 按 log(长边/短边) 排序；查询时二分定位后向两侧扩展，用长宽比+面积的综合距离比较
+        entries = []
+        for label in labels:
+            w, h = self.by_label[label]
+            entries.append((math.log(max(w, h) / min(w, h)), math.log(w * h), self._order[label], label))
+        entries.sort()
+        return [e[0] for e in entries], entries
+
+    def families(self):
+        return sorted(self.by_family)
+
+    def get(self, label):
+        return self.by_label.get(label)
+
+    def nearest(self, width, height, family=None):
+        width, height = int(width), int(height)
+        if width <= 0 or height <= 0:
+            raise ValueError("PresetRegistry: width and height must be positive")
+        index = self._index.get(family)
+        if index is None:
+            raise ValueError("PresetRegistry: unknown preset family {}".format(family))
+        aspects, entries = index
+        if not entries:
+            return None
+        target_aspect = math.log(max(width, height) / min(width, height))
+        target_area = math.log(width * height)
+        i = bisect.bisect_left(aspects, target_aspect)
+        best = None
+        # 距离 = ASPECT_WEIGHT * |Δlog长宽比| + |Δlog面积|；仅长宽比一项已不小于当前最优时停止扩展
+        for step in (-1, 1):
+            j = i if step > 0 else i - 1
+            while 0 <= j < len(entries):
+                aspect, area, order, candidate = entries[j]
+                bound = ASPECT_WEIGHT * abs(aspect - target_aspect)
+                if best is not None and bound > best[0]:
+                    break
+                key = (bound + abs(area - target_area), order)
+                if best is None or key < best:
+                    best = key + (candidate,)
+                j += step
+        label = best[2]
+
+        pw, ph = self.by_label[label]
+        # 预设以单一方向存储，按输入方向翻转
+        if pw != ph and (width > height) != (pw > ph):
+            pw, ph = ph, pw
+        return label, pw, ph
+
+
+def _load_user_presets(path):
+    presets = []
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        return presets
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            w, h = int(item["width"]), int(item["height"])
+        except Exception:
+            continue
+        if w <= 0 or h <= 0:
+            continue
+        label = item.get("label") or "Custom - {}\u00d7{}".format(w, h)
+        presets.append((str(label), (w, h)))
+    return presets
+
+
+def get_registry():
+    global _registry
+    global _registry_mtime
+    try:
+        mtime = os.path.getmtime(USER_PRESETS_PATH)
+    except OSError:
+        mtime = None
+    if _registry is not None and _registry_mtime == mtime:
+        return _registry
+    presets = list(RESOLUTION_PRESETS)
+    if mtime is not None:
+        try:
+            presets += _load_user_presets(USER_PRESETS_PATH)
+        except Exception:
+            pass
+    _registry = PresetRegistry(presets)
+    _registry_mtime = mtime
+    return _registry
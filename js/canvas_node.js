@@ -4,6 +4,16 @@ import { fabric } from "./lib/fabric-slim.min.js";
 import { queueManager } from "./queue_shortcut.js";
 
 const instances = new Map();
+
+// Encoding options sent with /funcode/canvas_save
+const SAVE_FORMAT_STORAGE_KEY = "FunCode.CanvasEditor.saveFormat";
+const SAVE_FORMATS = {
+    png: { label: "PNG", options: { format: "png", compress_level: 6 } },
+    png_fast: { label: "PNG fast", options: { format: "png", compress_level: 1 } },
+    webp: { label: "WebP q90", options: { format: "webp", quality: 90 } },
+    webp_lossless: { label: "WebP lossless", options: { format: "webp", lossless: true } },
+    jpeg: { label: "JPEG q92", options: { format: "jpeg", quality: 92 } },
+};
 let eventsReady = false;
 
 const initEvents = () => {
@@ -219,6 +229,23 @@ class FunCanvas {
         commonStyle(this.saveBtn);
         this.saveBtn.onclick = () => this.saveCanvas();
 
+        // Save encoding; identical composites with the same encoding are stored only once on the server
+        this.saveFormatSelect = document.createElement("select");
+        this.saveFormatSelect.title = "Save Format";
+        commonStyle(this.saveFormatSelect);
+        this.saveFormatSelect.style.width = "96px";
+        Object.keys(SAVE_FORMATS).forEach((key) => {
+            const opt = document.createElement("option");
+            opt.value = key;
+            opt.textContent = SAVE_FORMATS[key].label;
+            this.saveFormatSelect.appendChild(opt);
+        });
+        const storedFormat = localStorage.getItem(SAVE_FORMAT_STORAGE_KEY);
+        this.saveFormatSelect.value = SAVE_FORMATS[storedFormat] ? storedFormat : "png";
+        this.saveFormatSelect.onchange = () => {
+            localStorage.setItem(SAVE_FORMAT_STORAGE_KEY, this.saveFormatSelect.value);
+        };
+
         this.importBtn = document.createElement("button");
         this.importBtn.textContent = "Import";
         this.importBtn.title = "Import Image";
@@ -435,6 +462,7 @@ class FunCanvas {
         // Row 2: Tools and I/O and BgColor
         row2.appendChild(this.textBtn);
         row2.appendChild(this.saveBtn);
+        row2.appendChild(this.saveFormatSelect);
         row2.appendChild(this.importBtn);
         row2.appendChild(this.bgColorInput);
 
@@ -1915,24 +1943,36 @@ class FunCanvas {
             this.currentCanvasData = payload;
             this.lastPayloadString = JSON.stringify(payload);
         }
-        await api.fetchApi("/funcode/canvas_export", {
-            method: "POST",
-            body: JSON.stringify({ node_id: nodeId, image_b64: dataUrl, payload })
-        });
+        await this.postWithRetry("/funcode/canvas_export", { node_id: nodeId, image_b64: dataUrl, payload });
     }
 
     async saveCanvas() {
         const dataUrl = this.canvas.toDataURL({ format: "png" });
         const name = `canvas_${Date.now()}.png`;
-        await api.fetchApi("/funcode/canvas_save", {
-            method: "POST",
-            body: JSON.stringify({ image_b64: dataUrl, filename: name })
-        });
+        const format = SAVE_FORMATS[this.saveFormatSelect?.value] || SAVE_FORMATS.png;
+        const res = await this.postWithRetry("/funcode/canvas_save", { image_b64: dataUrl, filename: name, ...format.options });
+        if (res && res.ok) {
+            const data = await res.json();
+            if (data.deduplicated) console.log("[FunCode] Save: identical canvas already stored as", data.path);
+        }
+    }
+
+    // Backend answers 503 when too many canvas exports/saves are in flight; back off and retry
+    async postWithRetry(path, body, attempts = 5) {
+        const payload = JSON.stringify(body);
+        let res = null;
+        for (let i = 0; i < attempts; i++) {
+            res = await api.fetchApi(path, { method: "POST", body: payload });
+            if (res.status !== 503) return res;
+            await new Promise((resolve) => setTimeout(resolve, 200 * (i + 1)));
+        }
+        return res;
     }
 
     async openImportGallery() {
         const res = await api.fetchApi("/funcode/canvas_list", { method: "GET" });
         const data = await res.json();
+        // Served from the server-side canvas index; aliases (duplicate saves) map onto these files
         const files = Array.isArray(data.files) ? data.files : [];
         this.showGallery(files, async (filename) => {
             // Fix: Use correct view URL logic for loading image into canvas
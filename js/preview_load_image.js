@@ -1,6 +1,69 @@
 import { app } from "../../scripts/app.js";
 import { api } from "../../scripts/api.js";
 
+// input 目录 mtime 表：首次需要时整体拉取一次，之后由服务端 funcode_input_changed 事件增量更新
+const inputMtimes = {};
+const inputChangeListeners = new Set();
+let inputMtimesLoaded = null;
+
+const loadInputMtimes = () => {
+    if (!inputMtimesLoaded) {
+        inputMtimesLoaded = fetch(api.apiURL("/funcode/input_files_mtime"))
+            .then(res => res.json())
+            .then(data => {
+                const mtimes = data && data.mtimes && typeof data.mtimes === "object" ? data.mtimes : {};
+                Object.keys(mtimes).forEach(k => {
+                    const v = mtimes[k];
+                    if (Number.isFinite(Number(v))) inputMtimes[k] = Number(v);
+                });
+            })
+            .catch(() => {
+                inputMtimesLoaded = null;
+            });
+    }
+    return inputMtimesLoaded;
+};
+
+api.addEventListener("funcode_input_changed", (event) => {
+    const changes = (event.detail && event.detail.changes) || {};
+    const added = [];
+    const removed = [];
+    Object.keys(changes).forEach(name => {
+        const v = changes[name];
+        if (v === null || v === undefined) {
+            delete inputMtimes[name];
+            removed.push(name);
+        } else {
+            if (inputMtimes[name] === undefined) added.push(name);
+            inputMtimes[name] = Number(v);
+        }
+    });
+    // 新文件直接加入各节点的下拉列表、已删除的文件移出（当前选中项保留），无需刷新页面
+    if (added.length || removed.length) {
+        (app.graph?._nodes || []).forEach(node => {
+            if (node.comfyClass !== "LoadImageFunCodeNode") return;
+            const widget = node.widgets?.find(w => w.name === "image");
+            const values = widget?.options?.values;
+            if (!Array.isArray(values)) return;
+            removed.forEach(n => {
+                const idx = values.indexOf(n);
+                if (idx >= 0 && n !== widget.value) values.splice(idx, 1);
+            });
+            const missing = added.filter(n => !values.includes(n));
+            if (!missing.length) return;
+            values.push(...missing);
+            values.sort();
+        });
+    }
+    inputChangeListeners.forEach(fn => fn(changes));
+});
+
+// 断线期间的变化收不到事件，重连后重新拉取快照
+api.addEventListener("reconnected", () => {
+    inputMtimesLoaded = null;
+    loadInputMtimes();
+});
+
 app.registerExtension({
     name: "FunCode.LoadImageFunCodeNode",
     async nodeCreated(node) {
@@ -259,7 +322,6 @@ function showGallery(widget, node) {
 
     let sortMode = "default";
     let filterText = "";
-    let mtimeCache = {};
 
     // 通过 /view 请求缩略图尺寸
     const buildImageUrl = (filename, width, height) => {
@@ -442,20 +504,6 @@ function showGallery(widget, node) {
         updatePreviewSize(w, h);
     });
 
-    const fetchMtimes = async (filenames) => {
-        const res = await fetch(api.apiURL("/funcode/input_files_mtime"), {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ filenames })
-        });
-        const data = await res.json();
-        const mtimes = data && data.mtimes && typeof data.mtimes === "object" ? data.mtimes : {};
-        Object.keys(mtimes).forEach(k => {
-            const v = mtimes[k];
-            if (Number.isFinite(Number(v))) mtimeCache[k] = Number(v);
-        });
-    };
-
     const getFiltered = () => {
         const q = (filterText || "").trim().toLowerCase();
         if (!q) return originalImages.slice();
@@ -470,10 +518,10 @@ function showGallery(widget, node) {
             return list.sort((a, b) => String(b).localeCompare(String(a)));
         }
         if (sortMode === "mtime_asc") {
-            return list.sort((a, b) => (mtimeCache[a] || 0) - (mtimeCache[b] || 0));
+            return list.sort((a, b) => (inputMtimes[a] || 0) - (inputMtimes[b] || 0));
         }
         if (sortMode === "mtime_desc") {
-            return list.sort((a, b) => (mtimeCache[b] || 0) - (mtimeCache[a] || 0));
+            return list.sort((a, b) => (inputMtimes[b] || 0) - (inputMtimes[a] || 0));
         }
         return list;
     };
@@ -481,13 +529,7 @@ function showGallery(widget, node) {
     const refreshGallery = async () => {
         const filtered = getFiltered();
         if (sortMode === "mtime_asc" || sortMode === "mtime_desc") {
-            const missing = filtered.filter(n => mtimeCache[n] === undefined);
-            if (missing.length) {
-                try {
-                    await fetchMtimes(missing);
-                } catch (e) {
-                }
-            }
+            await loadInputMtimes();
         }
         const list = sortFiles(filtered.slice());
         buildGallery(list);
@@ -508,8 +550,34 @@ function showGallery(widget, node) {
         }, 120);
     });
 
+    // 目录变化时同步画廊：新增文件加入列表，删除的移除；按修改时间排序时重新排序
+    let changeTimer = null;
+    const onInputChanged = (changes) => {
+        let listChanged = false;
+        Object.keys(changes).forEach(name => {
+            const idx = originalImages.indexOf(name);
+            if (changes[name] === null || changes[name] === undefined) {
+                if (idx >= 0) {
+                    originalImages.splice(idx, 1);
+                    listChanged = true;
+                }
+            } else if (idx < 0) {
+                originalImages.push(name);
+                listChanged = true;
+            }
+        });
+        if (!listChanged && sortMode !== "mtime_asc" && sortMode !== "mtime_desc") return;
+        if (changeTimer) clearTimeout(changeTimer);
+        changeTimer = setTimeout(() => {
+            refreshGallery();
+        }, 120);
+    };
+    inputChangeListeners.add(onInputChanged);
+
     // 清理事件与观察器
     const cleanup = () => {
+        inputChangeListeners.delete(onInputChanged);
+        if (changeTimer) clearTimeout(changeTimer);
         if (document.body.contains(overlay)) document.body.removeChild(overlay);
         document.removeEventListener("keydown", escListener);
         if (observer) observer.disconnect();
@@ -0,0 +1,47 @@
+import { app } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
+
+// 后端开启 FUNCODE_PROFILE 后，每次 FunCode 节点执行会推送 funcode_profile 事件
+// 这里把总耗时与各阶段耗时绘制在节点标题上方
+const formatMs = (ms) => {
+    const n = Number(ms) || 0;
+    return n >= 1000 ? `${(n / 1000).toFixed(2)}s` : `${n.toFixed(1)}ms`;
+};
+
+const formatProfile = (profile) => {
+    const stages = Object.entries(profile.stages || {})
+        .sort((a, b) => b[1] - a[1])
+        .map(([name, ms]) => `${name} ${formatMs(ms)}`);
+    return [`⏱ ${formatMs(profile.total_ms)}`, ...stages].join(" · ");
+};
+
+app.registerExtension({
+    name: "FunCode.ProfileOverlay",
+    async setup() {
+        api.addEventListener("funcode_profile", (event) => {
+            const data = event.detail;
+            if (!data || data.node_id === undefined || data.node_id === null) return;
+            const node = app.graph?.getNodeById?.(Number(data.node_id)) || app.graph?.getNodeById?.(data.node_id);
+            if (!node) return;
+            node.funcodeProfile = data;
+            node.setDirtyCanvas(true, false);
+        });
+    },
+    async beforeRegisterNodeDef(nodeType, nodeData) {
+        if (!String(nodeData.category || "").startsWith("FunCode")) return;
+        const onDrawForeground = nodeType.prototype.onDrawForeground;
+        nodeType.prototype.onDrawForeground = function(ctx) {
+            const res = onDrawForeground?.apply(this, arguments);
+            if (!this.funcodeProfile || this.flags?.collapsed) return res;
+            const text = formatProfile(this.funcodeProfile);
+            const titleHeight = (window.LiteGraph && LiteGraph.NODE_TITLE_HEIGHT) || 30;
+            ctx.save();
+            ctx.font = "11px sans-serif";
+            ctx.fillStyle = "#8fd18f";
+            ctx.textAlign = "left";
+            ctx.fillText(text, 4, -titleHeight - 6);
+            ctx.restore();
+            return res;
+        };
+    }
+});
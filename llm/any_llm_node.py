@@ -5,8 +5,7 @@ import os
 import urllib.error
 import urllib.request
 
-import numpy as np
-from PIL import Image
+from ..profiler import profiled, span
 
 _env_loaded_paths = set()
 _env_mtimes = {}
@@ -85,12 +84,10 @@ def _prompts_dir():
 
 def collect_system_prompts():
     directory = _prompts_dir()
-    try:
-        os.makedirs(directory, exist_ok=True)
-    except Exception:
-        pass
     labels = []
     mapping = {}
+    if not os.path.isdir(directory):
+        return labels, mapping
     try:
         for name in sorted(os.listdir(directory)):
             path = os.path.join(directory, name)
@@ -114,6 +111,9 @@ def collect_system_prompts():
 
 
 def image_to_data_url(image):
+    import numpy as np
+    from PIL import Image
+
     try:
         import torch
     except Exception:
@@ -163,6 +163,20 @@ def build_messages(system_prompt, user_prompt, image_data_url):
     return messages
 
 
+def build_payload(model, messages, temperature, top_p, max_tokens, seed=None):
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "top_p": top_p,
+    }
+    if seed is not None:
+        payload["seed"] = seed
+    if max_tokens and max_tokens > 0:
+        payload["max_tokens"] = max_tokens
+    return payload
+
+
 def normalize_api_url(api_base):
     if api_base.endswith("/v1"):
         return api_base + "/chat/completions"
@@ -182,50 +196,78 @@ def normalize_api_url(api_base):
 def call_llm(api_base, api_key, model, system_prompt, user_prompt, image, temperature, top_p, max_tokens, timeout, seed=None):
     url = normalize_api_url(api_base)
     
-    # Explicitly handle image processing
-    image_data_url = None
-    if image is not None:
-        image_data_url = image_to_data_url(image)
-        
-    messages = build_messages(system_prompt, user_prompt, image_data_url)
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-        "top_p": top_p,
-    }
-    if seed is not None:
-        payload["seed"] = seed
-    if max_tokens and max_tokens > 0:
-        payload["max_tokens"] = max_tokens
-    data = json.dumps(payload).encode("utf-8")
+    with span("encode"):
+        # Explicitly handle image processing
+        image_data_url = None
+        if image is not None:
+            image_data_url = image_to_data_url(image)
+            
+        messages = build_messages(system_prompt, user_prompt, image_data_url)
+        payload = build_payload(model, messages, temperature, top_p, max_tokens, seed)
+        data = json.dumps(payload).encode("utf-8")
     headers = {"Content-Type": "application/json"}
     if api_key:
         headers["Authorization"] = "Bearer " + api_key
     req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        raw = resp.read().decode("utf-8")
-    try:
-        parsed = json.loads(raw)
-    except Exception:
+    with span("network"):
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            raw = resp.read().decode("utf-8")
+    with span("parse"):
+        try:
+            parsed = json.loads(raw)
+        except Exception:
+            return raw
+        choices = parsed.get("choices")
+        if isinstance(choices, list) and choices:
+            first = choices[0]
+            message = first.get("message")
+            if isinstance(message, dict) and "content" in message:
+                return message.get("content") or ""
+            if "text" in first:
+                return first.get("text") or ""
         return raw
-    choices = parsed.get("choices")
-    if isinstance(choices, list) and choices:
-        first = choices[0]
-        message = first.get("message")
-        if isinstance(message, dict) and "content" in message:
-            return message.get("content") or ""
-        if "text" in first:
-            return first.get("text") or ""
-    return raw
+
+
+def _env_path():
+    # Look for .env in the parent directory (package root)
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
+
+
+def resolve_profile_config(profile, api_base, api_key, model):
+    load_env_file(_env_path())
+    labels, mapping = collect_profiles()
+    default_base = env_default("LLM_API_BASE", "")
+    default_key = env_default("LLM_API_KEY", "")
+    default_model = env_default("LLM_MODEL", "")
+
+    # 1. Determine base config from Profile
+    config_base = ""
+    config_key = ""
+    config_model = ""
+
+    if profile == _default_profile_label:
+        config_base = default_base
+        config_key = default_key
+        config_model = default_model
+    elif profile in mapping:
+        profile_data = mapping[profile]
+        config_base = profile_data.get("api_base", "")
+        config_key = profile_data.get("api_key", "")
+        config_model = profile_data.get("model", "")
+    
+    # 2. Apply UI overrides (if provided)
+    # If UI field is NOT empty, it overrides the profile config
+    # If UI field IS empty, we use the profile config
+    final_base = api_base if api_base else config_base
+    final_key = api_key if api_key else config_key
+    final_model = model if model else config_model
+    return final_base, final_key, final_model
 
 
 class AnyLLMFunCodeNode:
     @classmethod
     def INPUT_TYPES(cls):
-        # Look for .env in the parent directory (package root)
-        env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
-        load_env_file(env_path)
+        load_env_file(_env_path())
         labels, mapping = collect_profiles()
         default_key = env_default("LLM_API_KEY", "")
         default_base = env_default("LLM_API_BASE", "")
@@ -256,36 +298,9 @@ class AnyLLMFunCodeNode:
     FUNCTION = "run"
     CATEGORY = "FunCode/LLM"
 
+    @profiled("AnyLLMFunCodeNode")
     def run(self, profile, api_base, api_key, model, seed, system_prompt_select, system_prompt, user_prompt, temperature, top_p, max_tokens, timeout, image=None):
-        # Look for .env in the parent directory (package root)
-        env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
-        load_env_file(env_path)
-        labels, mapping = collect_profiles()
-        default_base = env_default("LLM_API_BASE", "")
-        default_key = env_default("LLM_API_KEY", "")
-        default_model = env_default("LLM_MODEL", "")
-
-        # 1. Determine base config from Profile
-        config_base = ""
-        config_key = ""
-        config_model = ""
-
-        if profile == _default_profile_label:
-            config_base = default_base
-            config_key = default_key
-            config_model = default_model
-        elif profile in mapping:
-            profile_data = mapping[profile]
-            config_base = profile_data.get("api_base", "")
-            config_key = profile_data.get("api_key", "")
-            config_model = profile_data.get("model", "")
-        
-        # 2. Apply UI overrides (if provided)
-        # If UI field is NOT empty, it overrides the profile config
-        # If UI field IS empty, we use the profile config
-        final_base = api_base if api_base else config_base
-        final_key = api_key if api_key else config_key
-        final_model = model if model else config_model
+        final_base, final_key, final_model = resolve_profile_config(profile, api_base, api_key, model)
 
         if not final_base or not final_model:
             return ("ERROR: api_base and model are required (configure in .env or enter manually)",)
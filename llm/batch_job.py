@@ -0,0 +1,476 @@
+import hashlib
+import json
+import os
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+from .any_llm_node import (
+    AnyLLMFunCodeNode,
+    build_messages,
+    build_payload,
+    collect_system_prompts,
+    image_to_data_url,
+    resolve_profile_config,
+)
+
+# 每个批处理任务一个目录：分片 shard_*.jsonl + state.json + results_*.json，进程中断后可从最后完成的阶段继续
+JOBS_DIR = os.path.join(os.path.dirname(__file__), "batch_jobs")
+
+# OpenAI Batch API 单个输入文件上限为 200 MB / 50000 条请求，留出余量后分片提交
+MAX_SHARD_BYTES = 190 * 1024 * 1024
+MAX_SHARD_REQUESTS = 50000
+# 每个分片最多提交的次数（首次 + 重新提交），分片以 failed / expired / cancelled 结束时才重新提交；每次执行节点重新计数
+MAX_SUBMIT_ATTEMPTS = 3
+
+_image_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tiff', '.gif'}
+_terminal_statuses = {"completed", "failed", "expired", "cancelled"}
+
+
+def normalize_api_root(api_base):
+    # https://host/v1/chat/completions -> https://host/v1
+    root = api_base.rstrip("/")
+    if root.endswith("/chat/completions"):
+        root = root[: -len("/chat/completions")]
+    return root
+
+
+def _request(method, url, api_key, timeout, data=None, content_type="application/json"):
+    headers = {}
+    if data is not None:
+        headers["Content-Type"] = content_type
+    if api_key:
+        headers["Authorization"] = "Bearer " + api_key
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read()
+
+
+def _request_json(method, url, api_key, timeout, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    return json.loads(_request(method, url, api_key, timeout, data).decode("utf-8"))
+
+
+def upload_batch_file(api_root, api_key, path, timeout):
+    boundary = "----FunCodeBatch" + uuid.uuid4().hex
+    with open(path, "rb") as f:
+        content = f.read()
+    parts = [
+        "--{}\r\nContent-Disposition: form-data; name=\"purpose\"\r\n\r\nbatch\r\n".format(boundary).encode("utf-8"),
+        "--{}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{}\"\r\n"
+        "Content-Type: application/jsonl\r\n\r\n".format(boundary, os.path.basename(path)).encode("utf-8"),
+        content,
+        "\r\n--{}--\r\n".format(boundary).encode("utf-8"),
+    ]
+    raw = _request("POST", api_root + "/files", api_key, timeout, b"".join(parts),
+                   "multipart/form-data; boundary=" + boundary)
+    return json.loads(raw.decode("utf-8"))["id"]
+
+
+def batch_endpoint(api_root):
+    return urllib.parse.urlparse(api_root).path.rstrip("/") + "/chat/completions"
+
+
+def build_batch_line(endpoint, model, system_prompt, user_prompt, custom_id, image_data_url, temperature, top_p,
+                     max_tokens, seed=None):
+    messages = build_messages(system_prompt, user_prompt, image_data_url)
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": endpoint,
+        "body": build_payload(model, messages, temperature, top_p, max_tokens, seed),
+    }
+
+
+def parse_batch_output(raw):
+    results = {}
+    for line in raw.decode("utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except Exception:
+            continue
+        custom_id = entry.get("custom_id")
+        if custom_id is None:
+            continue
+        response = entry.get("response") or {}
+        body = response.get("body") or {}
+        choices = body.get("choices") if isinstance(body, dict) else None
+        if isinstance(choices, list) and choices:
+            message = choices[0].get("message")
+            if isinstance(message, dict) and "content" in message:
+                results[custom_id] = message.get("content") or ""
+                continue
+            if "text" in choices[0]:
+                results[custom_id] = choices[0].get("text") or ""
+                continue
+        error = entry.get("error")
+        if not error and isinstance(body, dict):
+            error = body.get("error")
+        results[custom_id] = "ERROR: " + json.dumps(error, ensure_ascii=False)
+    return results
+
+
+def job_digest(config, sources):
+    # 任务 ID 只由廉价的输入描述决定（文件路径 + mtime + 大小、张量指纹、模型、提示词、参数），
+    # 恢复/轮询时无需重新编码图片
+    text = json.dumps({"config": config, "sources": sources}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class BatchJob:
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.state_path = os.path.join(job_dir, "state.json")
+        self.state = self._load()
+        self._results = None
+
+    def _load(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def save(self):
+        os.makedirs(self.job_dir, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.state_path)
+
+    @classmethod
+    def open(cls, config, sources, jobs_dir=JOBS_DIR):
+        # sources: [(custom_id, label, fingerprint)]
+        digest = job_digest(config, sources)
+        job = cls(os.path.join(jobs_dir, digest))
+        if not job.state.get("job_id"):
+            job.state = {
+                "job_id": digest,
+                "created": time.time(),
+                "custom_ids": [cid for cid, _, _ in sources],
+                "labels": [label for _, label, _ in sources],
+            }
+        return job
+
+    @property
+    def job_id(self):
+        return self.state.get("job_id")
+
+    @property
+    def prepared(self):
+        return self.state.get("shards") is not None
+
+    @property
+    def done(self):
+        shards = self.state.get("shards")
+        return bool(shards) and all(shard["stage"] == "done" for shard in shards)
+
+    @property
+    def status(self):
+        shards = self.state.get("shards") or []
+        if not shards:
+            return "not_prepared"
+        if self.done:
+            return "completed"
+        finished = sum(1 for shard in shards if shard["stage"] == "done")
+        failed = [shard for shard in shards if shard["stage"] == "failed"]
+        if failed:
+            return "failed: {} after {} attempts ({}/{} shards done)".format(
+                failed[0].get("status"), failed[0].get("attempts"), finished, len(shards))
+        active = [shard.get("status") or shard["stage"] for shard in shards if shard["stage"] != "done"]
+        return "{} ({}/{} shards done)".format(active[0], finished, len(shards))
+
+    def write_shards(self, lines, max_bytes=MAX_SHARD_BYTES, max_requests=MAX_SHARD_REQUESTS):
+        # 按 Batch API 的输入文件上限切分；lines 为生成器，图片在写入时才逐张编码，不在内存中整体保留
+        os.makedirs(self.job_dir, exist_ok=True)
+        shards = []
+        f = None
+        size = 0
+        try:
+            for line in lines:
+                data = (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+                if len(data) > max_bytes:
+                    raise ValueError("BatchLLMNode: request {} exceeds the batch file size limit".format(line["custom_id"]))
+                if f is None or size + len(data) > max_bytes or len(shards[-1]["custom_ids"]) >= max_requests:
+                    if f is not None:
+                        f.close()
+                    name = "shard_{:04d}.jsonl".format(len(shards))
+                    shards.append({"file": name, "stage": "prepared", "custom_ids": []})
+                    f = open(os.path.join(self.job_dir, name), "wb")
+                    size = 0
+                f.write(data)
+                size += len(data)
+                shards[-1]["custom_ids"].append(line["custom_id"])
+        finally:
+            if f is not None:
+                f.close()
+        # 全部分片写完后才记录，写入中断时下次会整体重写
+        self.state["shards"] = shards
+        self.save()
+
+    def _step_shard(self, index, shard, api_root, api_key, timeout):
+        stage = shard["stage"]
+        if stage == "prepared":
+            path = os.path.join(self.job_dir, shard["file"])
+            shard["input_file_id"] = upload_batch_file(api_root, api_key, path, timeout)
+            shard["stage"] = "uploaded"
+        elif stage == "uploaded":
+            batch = _request_json("POST", api_root + "/batches", api_key, timeout, {
+                "input_file_id": shard["input_file_id"],
+                "endpoint": batch_endpoint(api_root),
+                "completion_window": "24h",
+            })
+            shard["batch_id"] = batch["id"]
+            shard["status"] = batch.get("status")
+            shard["stage"] = "submitted"
+        elif stage == "submitted":
+            batch = _request_json("GET", api_root + "/batches/" + shard["batch_id"], api_key, timeout)
+            shard["status"] = batch.get("status")
+            shard["request_counts"] = batch.get("request_counts")
+            if shard["status"] in _terminal_statuses:
+                shard["output_file_id"] = batch.get("output_file_id")
+                shard["error_file_id"] = batch.get("error_file_id")
+                shard["stage"] = "finished"
+        elif stage == "finished":
+            results = {}
+            for key in ("output_file_id", "error_file_id"):
+                file_id = shard.get(key)
+                if file_id:
+                    raw = _request("GET", api_root + "/files/" + file_id + "/content", api_key, timeout)
+                    results.update(parse_batch_output(raw))
+            if shard.get("status") == "completed":
+                self._write_results(index, results)
+                self._finish_shard(shard)
+                return
+            # 批次整体失败/过期/取消：保留已成功的结果，只对其余请求重新提交，不能标记为完成
+            self._write_results(index, {cid: text for cid, text in results.items() if not text.startswith("ERROR:")})
+            done_ids = self._load_results(index)
+            pending = [cid for cid in shard["custom_ids"] if cid not in done_ids]
+            if not pending:
+                self._finish_shard(shard)
+                return
+            shard["attempts"] = shard.get("attempts", 0) + 1
+            if shard["attempts"] >= MAX_SUBMIT_ATTEMPTS:
+                shard["stage"] = "failed"
+                return
+            retry_file = self._write_retry_file(shard, set(pending))
+            self._remove_shard_file(shard)
+            shard["file"] = retry_file
+            for key in ("input_file_id", "batch_id", "output_file_id", "error_file_id", "request_counts"):
+                shard.pop(key, None)
+            shard["stage"] = "prepared"
+
+    def _remove_shard_file(self, shard):
+        try:
+            os.remove(os.path.join(self.job_dir, shard["file"]))
+        except OSError:
+            pass
+
+    def _finish_shard(self, shard):
+        # 分片文件内联了全部图片的 base64，完成后只保留结果
+        self._remove_shard_file(shard)
+        shard["stage"] = "done"
+
+    def _results_path(self, index):
+        return os.path.join(self.job_dir, "results_{:04d}.json".format(index))
+
+    def _load_results(self, index):
+        try:
+            with open(self._results_path(index), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _write_results(self, index, results):
+        # 与之前部分完成时保存的结果合并
+        merged = self._load_results(index)
+        merged.update(results)
+        tmp = self._results_path(index) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False)
+        os.replace(tmp, self._results_path(index))
+        self._results = None
+
+    def _write_retry_file(self, shard, pending):
+        # 从上一次提交的分片文件中筛出未完成的请求行，无需重新编码图片
+        name = "{}.retry{}.jsonl".format(shard["file"].split(".", 1)[0], shard["attempts"])
+        with open(os.path.join(self.job_dir, shard["file"]), "rb") as src, \
+                open(os.path.join(self.job_dir, name), "wb") as dst:
+            for line in src:
+                if line.strip() and json.loads(line).get("custom_id") in pending:
+                    dst.write(line)
+        return name
+
+    def advance(self, api_root, api_key, timeout):
+        # 每个分片尽量推进：上传、提交、取回不等待，处理中的分片每轮只查询一次；返回是否仍有分片在处理
+        waiting = False
+        for index, shard in enumerate(self.state.get("shards") or []):
+            polled = False
+            while shard["stage"] not in ("done", "failed"):
+                if shard["stage"] == "submitted":
+                    if polled:
+                        waiting = True
+                        break
+                    polled = True
+                self._step_shard(index, shard, api_root, api_key, timeout)
+                self.save()
+        return waiting
+
+    def run(self, api_root, api_key, timeout, poll_interval, max_wait):
+        deadline = time.time() + max_wait
+        # 上次达到重试上限的分片：再次执行节点即视为手动重试
+        for shard in self.state.get("shards") or []:
+            if shard["stage"] == "failed":
+                shard["attempts"] = 0
+                shard["stage"] = "prepared"
+        while not self.done:
+            if not self.advance(api_root, api_key, timeout):
+                break
+            # 仍在处理中：超过 max_wait 则返回，下次执行从磁盘状态继续
+            if time.time() + poll_interval > deadline:
+                break
+            time.sleep(poll_interval)
+        return self
+
+    def results(self):
+        if self._results is None:
+            results = {}
+            for index in range(len(self.state.get("shards") or [])):
+                results.update(self._load_results(index))
+            self._results = results
+        return self._results
+
+    def ordered_results(self):
+        results = self.results()
+        return [results.get(cid, "ERROR: missing result") for cid in self.state.get("custom_ids", [])]
+
+
+def _folder_images(folder):
+    if not folder or not os.path.isdir(folder):
+        return []
+    names = sorted(n for n in os.listdir(folder) if os.path.splitext(n)[1].lower() in _image_extensions)
+    return [os.path.join(folder, n) for n in names if os.path.isfile(os.path.join(folder, n))]
+
+
+def _tensor_fingerprint(t):
+    import numpy as np
+
+    arr = np.ascontiguousarray(t.detach().cpu().numpy())
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(arr.shape).encode("utf-8"))
+    h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+# 可原样发送的格式：不重新编码，避免 JPEG 被转成更大的 PNG
+_passthrough_mime = {"JPEG": "image/jpeg", "PNG": "image/png"}
+
+
+def _file_to_data_url(path):
+    import base64
+
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as img:
+        mime = _passthrough_mime.get(img.format)
+        # EXIF 方向不为 1 时仍需旋转后重新编码
+        if mime is not None and img.getexif().get(0x0112, 1) == 1:
+            with open(path, "rb") as f:
+                return "data:{};base64,{}".format(mime, base64.b64encode(f.read()).decode("ascii"))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        return image_to_data_url(np.array(img))
+
+
+class BatchLLMFunCodeNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        base = AnyLLMFunCodeNode.INPUT_TYPES()["required"]
+        required = {k: v for k, v in base.items() if k != "seed"}
+        required.update({
+            "poll_interval": ("INT", {"default": 30, "min": 1, "max": 3600, "step": 1}),
+            "max_wait": ("INT", {"default": 0, "min": 0, "max": 86400, "step": 1}),
+            "write_captions": ("BOOLEAN", {"default": False}),
+        })
+        return {
+            "required": required,
+            "optional": {
+                "image": ("IMAGE",),
+                "folder": ("STRING", {"default": ""}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("texts", "job_id", "status")
+    OUTPUT_IS_LIST = (True, False, False)
+    FUNCTION = "run"
+    CATEGORY = "FunCode/LLM"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # 任务状态保存在磁盘上，每次执行都需要重新检查进度
+        return float("nan")
+
+    def run(self, profile, api_base, api_key, model, system_prompt_select, system_prompt, user_prompt, temperature, top_p,
+            max_tokens, timeout, poll_interval, max_wait, write_captions, image=None, folder=""):
+        final_base, final_key, final_model = resolve_profile_config(profile, api_base, api_key, model)
+        if not final_base or not final_model:
+            return (["ERROR: api_base and model are required (configure in .env or enter manually)"], "", "error")
+
+        prompt_labels, prompt_mapping = collect_system_prompts()
+        if system_prompt_select != "custom" and system_prompt_select in prompt_mapping:
+            system_prompt = prompt_mapping[system_prompt_select]
+
+        # 先只收集廉价的来源描述，用于定位/恢复任务；图片编码推迟到写分片时
+        sources = []
+        if image is not None:
+            for i in range(int(image.shape[0])):
+                cid = "image-{:05d}".format(i)
+                sources.append((cid, cid, _tensor_fingerprint(image[i])))
+        for path in _folder_images(folder):
+            st = os.stat(path)
+            sources.append(("file-{:05d}".format(len(sources)), path, [path, st.st_mtime_ns, st.st_size]))
+        if not sources:
+            return (["ERROR: no image batch or folder images to caption"], "", "error")
+
+        api_root = normalize_api_root(final_base)
+        endpoint = batch_endpoint(api_root)
+        config = {
+            "api_root": api_root,
+            "model": final_model,
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+        }
+        job = BatchJob.open(config, sources)
+        try:
+            if not job.prepared:
+                def lines():
+                    for index, (cid, label, _fingerprint) in enumerate(sources):
+                        data_url = image_to_data_url(image[index]) if cid.startswith("image-") else _file_to_data_url(label)
+                        yield build_batch_line(endpoint, final_model, system_prompt, user_prompt, cid, data_url,
+                                               temperature, top_p, max_tokens)
+
+                job.write_shards(lines())
+            job.run(api_root, final_key, timeout, poll_interval, max_wait)
+        except Exception as e:
+            return (["ERROR: " + type(e).__name__ + ": " + str(e)], job.job_id, job.status)
+
+        if not job.done:
+            # 列表输出不能为空，否则下游节点会以空输入执行；每个来源占位一条
+            return (["PENDING: " + job.status] * len(sources), job.job_id, job.status)
+
+        texts = job.ordered_results()
+        if write_captions:
+            for label, text in zip(job.state.get("labels", []), texts):
+                if not os.path.isfile(label) or text.startswith("ERROR:"):
+                    continue
+                with open(os.path.splitext(label)[0] + ".txt", "w", encoding="utf-8") as f:
+                    f.write(text)
+        return (texts, job.job_id, job.status)
@@ -0,0 +1,215 @@
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 按需开启：环境变量 FUNCODE_PROFILE=1，或 POST /funcode/profile {"enabled": true}
+# FUNCODE_PROFILE_CPROFILE=1 时每次执行额外输出一份 .prof 到 PROFILE_DIR
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "profiles")
+# 只保留最近的若干份 .prof，避免持续开启时在插件目录中无限堆积
+PROFILE_KEEP = 50
+
+_state = {
+    "enabled": os.environ.get("FUNCODE_PROFILE", "") not in ("", "0", "false"),
+    "cprofile": os.environ.get("FUNCODE_PROFILE_CPROFILE", "") not in ("", "0", "false"),
+}
+_lock = threading.Lock()
+_local = threading.local()
+_stats = {}
+_recent = deque(maxlen=50)
+_dump_counter = itertools.count()
+
+
+class _Execution:
+    def __init__(self, node_type):
+        self.node_type = node_type
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, ms):
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+
+def enabled():
+    return _state["enabled"]
+
+
+def configure(enabled=None, cprofile=None):
+    if enabled is not None:
+        _state["enabled"] = bool(enabled)
+    if cprofile is not None:
+        _state["cprofile"] = bool(cprofile)
+    return dict(_state)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _recent.clear()
+
+
+def snapshot():
+    with _lock:
+        nodes = {}
+        for node_type, entry in _stats.items():
+            nodes[node_type] = {
+                "calls": entry["calls"],
+                "total_ms": entry["total_ms"],
+                "mean_ms": entry["total_ms"] / entry["calls"] if entry["calls"] else 0.0,
+                "max_ms": entry["max_ms"],
+                "stages": {k: dict(v) for k, v in entry["stages"].items()},
+            }
+        return {"enabled": _state["enabled"], "cprofile": _state["cprofile"], "nodes": nodes, "recent": list(_recent)}
+
+
+@contextmanager
+def span(stage):
+    execution = getattr(_local, "execution", None)
+    if execution is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        execution.add(stage, (time.perf_counter() - start) * 1000.0)
+
+
+def bind(fn):
+    # 线程池中的 span 归属到提交任务时的那次执行（各线程耗时累加）
+    execution = getattr(_local, "execution", None)
+    if execution is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "execution", None)
+        _local.execution = execution
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.execution = previous
+
+    return wrapper
+
+
+def _record(execution, total_ms, node_id):
+    with _lock:
+        entry = _stats.setdefault(execution.node_type, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "stages": {}})
+        entry["calls"] += 1
+        entry["total_ms"] += total_ms
+        entry["max_ms"] = max(entry["max_ms"], total_ms)
+        for stage, ms in execution.stages.items():
+            s = entry["stages"].setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["count"] += 1
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+        result = {
+            "node_id": node_id,
+            "node_type": execution.node_type,
+            "total_ms": total_ms,
+            "stages": dict(execution.stages),
+            "time": time.time(),
+        }
+        _recent.append(result)
+    return result
+
+
+def _current_node_id():
+    try:
+        from server import PromptServer
+
+        return getattr(PromptServer.instance, "last_node_id", None)
+    except Exception:
+        return None
+
+
+def _push(result):
+    try:
+        from server import PromptServer
+
+        PromptServer.instance.send_sync("funcode_profile", result)
+    except Exception:
+        pass
+
+
+def _dump_cprofile(profile, node_type):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = "{}_{}_{}.prof".format(node_type, int(time.time() * 1000), next(_dump_counter))
+        profile.dump_stats(os.path.join(PROFILE_DIR, name))
+        _prune_profiles()
+    except Exception:
+        pass
+
+
+def _prune_profiles():
+    entries = []
+    with os.scandir(PROFILE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".prof") and entry.is_file():
+                entries.append((entry.stat().st_mtime, entry.path))
+    entries.sort()
+    for _, path in entries[:max(0, len(entries) - PROFILE_KEEP)]:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+
+
+def profiled(node_type):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"] or getattr(_local, "execution", None) is not None:
+                return fn(*args, **kwargs)
+            execution = _Execution(node_type)
+            _local.execution = execution
+            profile = None
+            if _state["cprofile"]:
+                import cProfile
+
+                profile = cProfile.Profile()
+            start = time.perf_counter()
+            try:
+                if profile is not None:
+                    return profile.runcall(fn, *args, **kwargs)
+                return fn(*args, **kwargs)
+            finally:
+                total_ms = (time.perf_counter() - start) * 1000.0
+                _local.execution = None
+                if profile is not None:
+                    _dump_cprofile(profile, node_type)
+                _push(_record(execution, total_ms, _current_node_id()))
+
+        return wrapper
+
+    return decorator
+
+
+try:
+    import aiohttp.web
+    from server import PromptServer
+
+    @PromptServer.instance.routes.get("/funcode/profile")
+    async def funcode_profile_get(request):
+        return aiohttp.web.json_response(snapshot())
+
+    @PromptServer.instance.routes.post("/funcode/profile")
+    async def funcode_profile_post(request):
+        try:
+            payload = await request.json()
+        except Exception:
+            payload = {}
+        if not isinstance(payload, dict):
+            payload = {}
+        if payload.get("reset"):
+            reset()
+        configure(payload.get("enabled"), payload.get("cprofile"))
+        return aiohttp.web.json_response(snapshot())
+except Exception:
+    pass